@@ -1,488 +1,123 @@
 import streamlit as st
 import pandas as pd
-import math
-import os
 import traceback
-from datetime import datetime
+import io
+import hashlib
+import fnmatch
+from sizing_engine import (
+    APP_TITLE, DEFAULT_LOGO, REQ_MAPS, SizingParams, file_digest, load_tables_cached, default_cache_dir, cache_policy, load_many, merge_exports,
+    auto_map_scored,
+    normalize_tables, filter_tables, summarize_clusters, size_workload, generate_html_report,
+    SWEEP_DEFAULTS, sweep_scenarios, EXAMPLE_CATALOG, optimize_catalog, place_workload,
+)
 
 # --- 1. PAGE CONFIG (MUST BE FIRST) ---
-APP_TITLE = "Virtualization Sizing Calculator"
-DEFAULT_LOGO = "https://placehold.co/200x50/004B87/ffffff?text=AHEAD"
-
 st.set_page_config(
     page_title=APP_TITLE, 
     layout="wide", 
     page_icon="📊"
 )
 
-# --- UTILS ---
-def to_float(series):
-    """Safely converts a series to float, handling commas and strings."""
-    if series is None: return 0.0
-    return pd.to_numeric(series.astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-
-def clean_sheet_names(sheets):
-    return {k.strip(): v for k, v in sheets.items()}
-
-def promote_header(df, keywords):
-    """Scans for a header row containing specific keywords."""
-    df = df.reset_index(drop=True)
-    for i in range(min(20, len(df))):
-        row_str = " ".join(df.iloc[i].astype(str).fillna('').values).lower()
-        if any(k.lower() in row_str for k in keywords):
-            df.columns = df.iloc[i]
-            df.columns = df.columns.fillna('').astype(str).str.strip()
-            df = df[i+1:].reset_index(drop=True)
-            return df
-    df.columns = df.iloc[0]
-    df.columns = df.columns.fillna('').astype(str).str.strip()
-    df = df[1:].reset_index(drop=True)
-    return df
-
-def get_col(df, keywords):
-    """Finds a column name: Prioritizes EXACT match, then falls back to PARTIAL match."""
-    if df is None or df.empty: return None
-    if isinstance(keywords, str): keywords = [keywords]
-    
-    # 1. Exact Match 
-    for kw in keywords:
-        exact = next((c for c in df.columns if str(c).strip().lower() == kw.lower()), None)
-        if exact: return exact
-    
-    # 2. Smart Partial Match
-    for kw in keywords:
-        for c in df.columns:
-            cl = str(c).lower()
-            if kw.lower() in cl:
-                if kw.lower() == 'capacity' and 'cluster' in cl: continue
-                if kw.lower() == 'cluster' and any(bad in cl for bad in ['rule', 'capacity', 'free', 'space', 'id']): continue
-                return c
-    return None
-
-def safe_sum(df, col_name):
-    if col_name == "Not Found" or col_name not in df.columns: return 0.0
-    return to_float(df[col_name]).sum()
-
-def extract_gb(df, col_name):
-    """Smart unit converter based on column name."""
-    if col_name == "Not Found" or col_name not in df.columns: return 0.0
-    cl = str(col_name).lower()
-    val = to_float(df[col_name]).sum()
-    
-    if 'tb' in cl or 'tib' in cl: return val * 1024
-    if 'gb' in cl or 'gib' in cl: return val
-    if 'kb' in cl or 'kib' in cl: return val / 1048576
-    if 'bytes' in cl or ' b' in cl: return val / 1073741824
-    return val / 1024  # Default assume MB/MiB
-
-def extract_tb(df, col_name):
-    return extract_gb(df, col_name) / 1024
-
-def calc_license_cores(sockets, cores_per_socket):
-    billable_per_socket = max(cores_per_socket, 16)
-    return sockets * billable_per_socket
-
-# --- REPORT GENERATOR ---
-def generate_html_report(data, scope_name, source_filename, customer_name, logo_url):
-    now = datetime.now().strftime("%Y-%m-%d")
-    lic_prefix = "+" if data.get('lic_diff', 0) > 0 else ""
-    lic_color = "#d9534f" if data.get('lic_diff', 0) > 0 else "#28a745"
-
-    vm_check_html = "<div style='color:#666;'>No VM data found.</div>"
-    if data.get('max_vm_cpu', 0) > 0:
-        cpu_stat = "⚠️ Exceeds Socket" if data['max_vm_cpu'] > data['tgt_numa_cores'] else "✅ Fits NUMA"
-        ram_stat = "⚠️ Exceeds Socket" if data['max_vm_ram'] > data['tgt_numa_ram'] else "✅ Fits NUMA"
-        vm_check_html = f"""
-        <div style="font-size:0.9em; margin-bottom:5px;"><strong>{data['name_max_cpu']}</strong>: {data['max_vm_cpu']} vCPU ({cpu_stat})</div>
-        <div style="font-size:0.9em;"><strong>{data['name_max_ram']}</strong>: {data['max_vm_ram']:.0f} GB RAM ({ram_stat})</div>"""
-
-    vsan_html = ""
-    rvtools_warn = ""
-    if data.get('src_type') == 'RVTools':
-        rvtools_warn = "<br><br><i style='color:#c62828; font-size:0.85em;'>⚠️ <b>Note:</b> The RVTools vSAN capacity estimate excludes the cache tier and formatting overhead. A hardware BOM or Live Optics run is required for down-to-the-byte licensing accuracy.</i>"
-        
-    if data.get('vsan_detected'):
-        if data.get('vsan_raw_tib', 0) > 0:
-            vsan_html = f"""
-            <div style="margin-top:10px; padding:8px; background:#e8f5e9; border:1px solid #c8e6c9; color:#2e7d32; border-radius:4px; font-size:0.9em;">
-                <strong>✅ vSAN/VxRail Detected in Source</strong><br>
-                Raw Capacity: <strong>{data['vsan_raw_tib']:,.1f} TiB</strong><br>
-                <i>Note: Raw TiB is used for VVF/VCF licensing. Usable capacity depends on RAID policy.</i>{rvtools_warn}
-            </div>"""
+# Parsed workbooks kept across reruns; oldest-used entries are evicted first.
+WORKBOOK_CACHE_SIZE = 8
+# Auto-mapped fields scoring below this are flagged in the mapping panel.
+LOW_MATCH_CONFIDENCE = 0.5
+# Parsed tables also persist on disk across sessions (see sizing_engine TABLE CACHE).
+TABLE_CACHE_DIR = default_cache_dir()
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_SIZE, show_spinner="Parsing workbook...")
+def parse_workbook(file_hash, streaming, _file):
+    """Keyed on the content hash only, so sidebar changes reuse the parsed tables
+    instead of re-reading the file."""
+    return load_tables_cached(_file, streaming, TABLE_CACHE_DIR, file_hash)
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_SIZE, show_spinner="Parsing and consolidating workbooks...")
+def parse_merged(file_hashes, streaming, _files):
+    """All uploads parsed in parallel and merged into one estate (duplicate VMs removed)."""
+    loaded = load_many([io.BytesIO(f.getvalue()) for f in _files], streaming=streaming, cache_dir=TABLE_CACHE_DIR)
+    return merge_exports(loaded, [f.name for f in _files])
+
+# --- CACHED PIPELINE STAGES ---
+# Each stage is keyed only on the inputs that change its output; tables are passed
+# as unhashed (_underscore) arguments. Upstream stages only run on a downstream miss,
+# so a hardware change skips straight to size_workload.
+@st.cache_data(max_entries=WORKBOOK_CACHE_SIZE)
+def normalize_stage(file_hash, maps, _df_map):
+    return normalize_tables(_df_map, maps)
+
+@st.cache_data(max_entries=32)
+def filter_stage(file_hash, maps, clusters, include_off, _df_map):
+    return filter_tables(normalize_stage(file_hash, maps, _df_map), list(clusters), include_off)
+
+# Per-cluster partial sums, once per mapping; a cluster toggle only adds up summary rows.
+# Held as a shared resource (combine() never mutates it) so reruns skip the unpickling.
+@st.cache_resource(max_entries=WORKBOOK_CACHE_SIZE)
+def summary_stage(file_hash, src_type, maps, _df_map):
+    return summarize_clusters(normalize_stage(file_hash, maps, _df_map), src_type)
+
+def match_clusters(names, query):
+    """Mask of names matching the picker query: comma-separated alternatives, each a
+    glob when it holds * ? or [, otherwise a case-insensitive substring."""
+    names = pd.Series(names, dtype=str)
+    mask = pd.Series(not query.strip(), index=names.index)
+    for term in filter(None, (t.strip() for t in query.split(","))):
+        if any(ch in term for ch in "*?["):
+            mask |= names.map(lambda n: fnmatch.fnmatchcase(n.lower(), term.lower()))
         else:
-            vsan_html = f"""
-            <div style="margin-top:10px; padding:8px; background:#e8f5e9; border:1px solid #c8e6c9; color:#2e7d32; border-radius:4px; font-size:0.9em;">
-                <strong>✅ vSAN/VxRail Detected in Source</strong><br>
-                <i>Note: Storage capacity planning for vSAN depends on RAID policy (RAID1/5/6) and is not calculated here.</i>{rvtools_warn}
-            </div>"""
-
-    perf_html = ""
-    if data.get('has_perf'):
-        perf_html = f"""
-        <h2>6. Performance Analysis (Live Optics)</h2>
-        <div class="card">
-            <div class="section-label">Allocation vs. Consumption ({data['lo_basis']})</div>
-            <div class="grid">
-                <div>
-                    <div style="font-size:0.9em; color:#666;">Allocated (Entitlement)</div>
-                    <div class="metric">{data['tot_vcpu']:,.0f} vCPU</div>
-                </div>
-                <div>
-                    <div style="font-size:0.9em; color:#666;">Consumed ({data['lo_basis']})</div>
-                    <div class="metric">{data['perf_ghz_demand']:,.1f} GHz</div>
-                </div>
-            </div>
-            <div style="margin-top:10px; padding-top:10px; border-top:1px solid #ddd;">
-                <div style="font-size:1.1em; margin-bottom:10px;">Workload requires <strong>{data['perf_hosts_rec']} Hosts</strong> to satisfy demand.</div>
-            </div>
-        </div>"""
-
-    html = f"""
-    <html>
-    <head>
-        <title>Sizing Report - {customer_name}</title>
-        <style>
-            body {{ font-family: "Segoe UI", sans-serif; max-width: 1000px; margin: auto; padding: 40px; color: #333; background: #fff; }}
-            .header-container {{ border-bottom: 3px solid #004B87; padding-bottom: 20px; margin-bottom: 30px; display: flex; justify-content: space-between; align-items: center; }}
-            .header-text h1 {{ margin: 0; font-size: 24px; color: #000; text-transform: uppercase; letter-spacing: 1px; }}
-            .header-logo img {{ max-height: 60px; }}
-            h2 {{ color: #004B87; border-left: 5px solid #004B87; padding-left: 10px; margin-top: 40px; text-transform: uppercase; font-size: 1.1em; }}
-            .card {{ background: #f9f9f9; padding: 20px; border-radius: 4px; border: 1px solid #eee; margin-bottom: 20px; page-break-inside: avoid; }}
-            .grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 20px; }}
-            .metric {{ font-size: 1.6em; font-weight: bold; color: #2c3e50; margin: 5px 0; }}
-            .section-label {{ font-weight: bold; color: #004B87; text-transform: uppercase; font-size: 0.8em; display:block; margin-bottom: 8px; }}
-            table {{ width: 100%; border-collapse: collapse; margin-bottom: 10px; table-layout: fixed; }}
-            th, td {{ border-bottom: 1px solid #ddd; padding: 8px; text-align: left; font-size: 0.9em; overflow: hidden; white-space: nowrap; text-overflow: ellipsis; }}
-            th {{ background-color: #f1f1f1; color: #555; text-transform: uppercase; font-size: 0.8em; width: 40%; }}
-            td {{ width: 60%; }}
-            .lic-delta {{ font-weight: bold; color: {lic_color}; }}
-            .footer {{ margin-top:50px; text-align:center; color:#999; font-size:0.8em; border-top: 1px solid #eee; padding-top: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="header-container">
-            <div class="header-text">
-                <h1>{APP_TITLE}</h1>
-                <div style="color:#666; font-size:14px;">Prepared for <strong>{customer_name}</strong> | {now}</div>
-                <div style="color:#666; font-size:12px; margin-top:5px;">Scope: {scope_name}</div>
-            </div>
-            <div class="header-logo"><img src="{logo_url}"></div>
-        </div>
-        
-        <h2>1. Executive Sizing Recommendation</h2>
-        <div class="grid">
-            <div class="card" style="background-color: #e6f3ff; border: 1px solid #b6d4fe;">
-                <div class="section-label">Current Refresh Requirement</div>
-                <div class="metric">{data['hosts_now']} Hosts</div>
-                <div>Configuration: N+{data['ha_nodes']}</div>
-                <div>Efficiency: <strong>{data['ratio_now']:.1f}:1</strong> vCPU:pCPU</div>
-                <div style="margin-top:10px; font-size:0.9em;">Constraint: <strong>{data['constraint']} Bound</strong></div>
-            </div>
-            <div class="card" style="background-color: #e6f3ff; border: 1px solid #b6d4fe;">
-                <div class="section-label">Future Requirement</div>
-                <div class="metric">{data['hosts_fut']} Hosts</div>
-                <div>Growth Model: {data['growth']*100:.0f}% Annually over {data['years']} Years</div>
-                <div>Efficiency: <strong>{data['ratio_fut']:.1f}:1</strong> vCPU:pCPU</div>
-                <div>Projected vCPU: {data['fut_vcpu']:,.0f}</div>
-            </div>
-        </div>
-
-        <div class="card">
-            <div class="section-label">Target Hardware Specification</div>
-            <div class="grid" style="grid-template-columns: 1fr 1fr 1fr;">
-                <div>
-                    <div><strong>Per Node Config</strong></div>
-                    <div>{data['sockets']} Sockets x {data['cores']} Cores</div>
-                    <div>{data['host_cap_cores']} Physical Cores</div>
-                    <div>{data['ram']} GB RAM</div>
-                </div>
-                <div>
-                    <div><strong>Cluster Capacity (Day 1)</strong></div>
-                    <div>{data['hosts_now'] * data['host_cap_cores']} Total Cores</div>
-                    <div>{data['hosts_now'] * data['ram']:,.0f} GB Total RAM</div>
-                </div>
-                <div>
-                    <div><strong>Cluster Capacity (Future)</strong></div>
-                    <div>{data['hosts_fut'] * data['host_cap_cores']} Total Cores</div>
-                    <div>{data['hosts_fut'] * data['ram']:,.0f} GB Total RAM</div>
-                </div>
-            </div>
-        </div>
-
-        <h2>2. Workload Scope</h2>
-        <div class="card">
-            <div class="grid">
-                <div>
-                    <span class="section-label">Legacy Supply (Consolidated)</span>
-                    <table>
-                        <tr><th>Hosts</th><td>{data['cur_host_count']}</td></tr>
-                        <tr><th>Physical Cores</th><td>{data['cur_cores']:,.0f}</td></tr>
-                        <tr><th>Total RAM</th><td>{data['cur_total_ram_gb']:,.0f} GB</td></tr>
-                    </table>
-                </div>
-                <div>
-                    <span class="section-label">VM Demand</span>
-                    <table>
-                        <tr><th>VMs</th><td>{data['tot_vms']}</td></tr>
-                        <tr><th>vCPU</th><td>{data['tot_vcpu']:,.0f}</td></tr>
-                        <tr><th>vRAM</th><td>{data['tot_ram']:,.0f} GB</td></tr>
-                        <tr><th>Current Ratio</th><td><strong>{data['cur_ratio']:.1f}:1</strong></td></tr>
-                    </table>
-                </div>
-            </div>
-        </div>
-
-        <h2>3. Storage Requirements</h2>
-        <div class="grid">
-            <div class="card">
-                <div class="section-label">VM Allocation (vInfo)</div>
-                <table>
-                    <tr><th>Provisioned</th><td><strong>{data.get('vinfo_prov', 0):,.1f} TB</strong></td></tr>
-                    <tr><th>In Use</th><td><strong>{data.get('vinfo_used', 0):,.1f} TB</strong></td></tr>
-                </table>
-            </div>
-            <div class="card">
-                <div class="section-label">Infrastructure</div>
-                <div style="font-size:0.8em; color:#666; margin-bottom:8px;">
-                    <i>Includes VMFS, NFS, and shared SAN/LUNs (excludes vSAN/VxRail).</i>
-                </div>
-                <table>
-                    <tr><th>Total Capacity</th><td><strong>{data['ds_cap']:,.1f} TB</strong></td></tr>
-                    <tr><th>Free Space</th><td><strong>{data['ds_free']:,.1f} TB</strong></td></tr>
-                </table>
-                {vsan_html}
-            </div>
-        </div>
-
-        <h2>4. Architecture & NUMA</h2>
-        <div class="grid">
-            <div class="card">
-                <div class="section-label">NUMA Boundary</div>
-                <table>
-                    <tr><th>Hardware</th><th>Cores</th><th>Memory</th></tr>
-                    <tr><td>Target</td><td>{data['tgt_numa_cores']}</td><td>{data['tgt_numa_ram']:.0f} GB</td></tr>
-                </table>
-            </div>
-            <div class="card">
-                <div class="section-label">Large VM Check</div>
-                {vm_check_html}
-            </div>
-        </div>
-
-        <h2>5. Licensing Impact</h2>
-        <div class="card">
-            <div class="grid" style="grid-template-columns: 1fr 1fr 1fr;">
-                <div>
-                    <div class="section-label">Legacy State</div>
-                    <div class="metric">{data['cur_lic_cores']:,.0f} Cores</div>
-                    <div style="margin-bottom:10px;">{data['cur_host_count']} Hosts</div>
-                </div>
-                <div>
-                    <div class="section-label">Current Refresh</div>
-                    <div class="metric">{data['now_lic_cores']:,.0f} Cores</div>
-                    <div style="margin-bottom:10px;">{data['hosts_now']} Hosts</div>
-                </div>
-                <div>
-                    <div class="section-label">Future w/ Growth</div>
-                    <div class="metric">{data['fut_lic_cores']:,.0f} Cores</div>
-                    <div class="lic-delta">Net: {lic_prefix}{data['lic_diff']} Cores</div>
-                </div>
-            </div>
-        </div>
-
-        {perf_html}
-        
-        <div class="footer">Generated by {APP_TITLE} | Source: {source_filename}</div>
-    </body>
-    </html>
-    """
-    return html
-
-# --- PROCESSORS ---
-def process_mapped_data(df_vm, df_h, df_ds, df_d, source_type, selected_clusters, include_off, maps):
-    db = {
-        'tot_vms': 0, 'tot_vcpu': 0, 'tot_ram': 0, 
-        'vinfo_prov': 0, 'vinfo_used': 0, 
-        'cur_cores': 0, 'cur_host_count': 0, 'cur_total_ram_gb': 0, 'cur_lic_cores': 0,
-        'max_vm_cpu': 0, 'max_vm_ram': 0, 'name_max_cpu': "N/A", 'name_max_ram': "N/A",
-        'ds_cap': 0, 'ds_used': 0, 'ds_free': 0,
-        'has_perf': False, 'perf_ghz_demand': 0, 'lic_edition': "Unknown",
-        'vsan_detected': False, 'vsan_raw_tib': 0
-    }
-
-    def apply_filter(df, col_c, col_p):
-        if df is None: return None
-        
-        if col_c and selected_clusters:
-            if "All Clusters" not in selected_clusters:
-                c_name = get_col(df, [col_c, f'vInfo{col_c}', f'vDatastore{col_c}', f'vHost{col_c}'])
-                if c_name: 
-                    df[c_name] = df[c_name].fillna("Unclustered")
-                    df = df[df[c_name].isin(selected_clusters)]
-                    
-        if col_p and not include_off:
-            p_name = get_col(df, [col_p, f'vInfo{col_p}'])
-            if p_name: df = df[df[p_name].astype(str).str.contains('poweredOn', case=False, na=False)]
-        
-        return df
-
-    # 1. VM Processing
-    if df_vm is not None and not df_vm.empty:
-        if maps['vm_cluster'] != "Not Found" and selected_clusters and "All Clusters" not in selected_clusters:
-            df_vm[maps['vm_cluster']] = df_vm[maps['vm_cluster']].fillna("Unclustered")
-            df_vm = df_vm[df_vm[maps['vm_cluster']].isin(selected_clusters)]
-            
-        if maps['vm_power'] != "Not Found" and not include_off:
-            df_vm = df_vm[df_vm[maps['vm_power']].astype(str).str.contains('poweredOn', case=False, na=False)]
-            
-        db['tot_vms'] = len(df_vm)
-        db['tot_vcpu'] = safe_sum(df_vm, maps['vm_cpu'])
-        
-        if maps['vm_ram'] != "Not Found": db['tot_ram'] = extract_gb(df_vm, maps['vm_ram'])
-        if maps['vm_prov'] != "Not Found": db['vinfo_prov'] = extract_tb(df_vm, maps['vm_prov'])
-        if maps['vm_used'] != "Not Found": db['vinfo_used'] = extract_tb(df_vm, maps['vm_used'])
-        
-        if maps['vm_cpu'] != "Not Found": 
-            db['max_vm_cpu'] = to_float(df_vm[maps['vm_cpu']]).max()
-            if maps['vm_name'] != "Not Found": 
-                db['name_max_cpu'] = df_vm.loc[to_float(df_vm[maps['vm_cpu']]).idxmax(), maps['vm_name']]
-                
-        if maps['vm_ram'] != "Not Found": 
-            raw_max_ram = to_float(df_vm[maps['vm_ram']]).max()
-            cl = str(maps['vm_ram']).lower()
-            if 'tb' in cl or 'tib' in cl: max_gb = raw_max_ram * 1024
-            elif 'gb' in cl or 'gib' in cl: max_gb = raw_max_ram
-            elif 'kb' in cl or 'kib' in cl: max_gb = raw_max_ram / 1048576
-            elif 'bytes' in cl or ' b' in cl: max_gb = raw_max_ram / 1073741824
-            else: max_gb = raw_max_ram / 1024
-            db['max_vm_ram'] = max_gb
-            
-            if maps['vm_name'] != "Not Found": 
-                db['name_max_ram'] = df_vm.loc[to_float(df_vm[maps['vm_ram']]).idxmax(), maps['vm_name']]
-
-    # 2. Host Processing
-    host_to_cluster = {}
-    if df_h is not None and not df_h.empty:
-        if maps['h_name'] != "Not Found" and maps['h_cluster'] != "Not Found":
-            host_to_cluster = pd.Series(df_h[maps['h_cluster']].values, index=df_h[maps['h_name']]).to_dict()
-            
-        if maps['h_cluster'] != "Not Found" and selected_clusters and "All Clusters" not in selected_clusters:
-            df_h[maps['h_cluster']] = df_h[maps['h_cluster']].fillna("Unclustered")
-            df_h = df_h[df_h[maps['h_cluster']].isin(selected_clusters)]
-            
-        db['cur_host_count'] = len(df_h)
-        if maps['h_ram'] != "Not Found": db['cur_total_ram_gb'] = extract_gb(df_h, maps['h_ram'])
-        
-        if source_type == "RVTools":
-            if maps['h_cpu'] != "Not Found" and maps['h_core'] != "Not Found":
-                db['cur_cores'] = (to_float(df_h[maps['h_cpu']]) * to_float(df_h[maps['h_core']])).sum()
-                for _, row in df_h.iterrows():
-                    db['cur_lic_cores'] += (float(row[maps['h_cpu']]) * max(float(row[maps['h_core']]), 16))
-        else:
-            if maps['h_core'] != "Not Found": db['cur_cores'] = safe_sum(df_h, maps['h_core'])
-            if maps['h_cpu'] != "Not Found" and maps['h_core'] != "Not Found":
-                for _, row in df_h.iterrows():
-                    try:
-                        s = float(row[maps['h_cpu']])
-                        c = float(row[maps['h_core']])
-                        if s > 0: db['cur_lic_cores'] += (s * max(c/s, 16))
-                    except: pass
-
-    # 3. Storage Processing
-    if df_ds is not None and not df_ds.empty:
-        if maps['ds_hosts'] != "Not Found" and selected_clusters and "All Clusters" not in selected_clusters and host_to_cluster:
-            def map_cluster(hosts_str):
-                if pd.isna(hosts_str): return "Unclustered"
-                for h in str(hosts_str).split(','):
-                    h = h.strip()
-                    if h in host_to_cluster: return host_to_cluster[h]
-                    h_short = h.split('.')[0]
-                    for vh in host_to_cluster:
-                        if vh.startswith(h_short): return host_to_cluster[vh]
-                return "Unclustered"
-            
-            df_ds['ClusterMap'] = df_ds[maps['ds_hosts']].apply(map_cluster)
-            df_ds = df_ds[df_ds['ClusterMap'].isin(selected_clusters)]
-            
-        mask_vsan = pd.Series([False]*len(df_ds), index=df_ds.index)
-        if maps['ds_type'] != "Not Found":
-            mask_vsan = mask_vsan | (df_ds[maps['ds_type']].astype(str).str.lower() == 'vsan')
-        if maps['ds_name'] != "Not Found":
-            mask_vsan = mask_vsan | (df_ds[maps['ds_name']].astype(str).str.contains('vsan|vxrail', case=False, na=False))
-            
-        vsan_ds = df_ds[mask_vsan]
-        if not vsan_ds.empty:
-            db['vsan_detected'] = True
-            db['vsan_raw_tib'] = extract_tb(vsan_ds, maps['ds_cap'])
-            
-        df_san = df_ds[~mask_vsan]
-        db['ds_cap'] = extract_tb(df_san, maps['ds_cap'])
-        if maps['ds_free'] != "Not Found":
-            db['ds_free'] = extract_tb(df_san, maps['ds_free'])
-        if maps['ds_used'] != "Not Found":
-            db['ds_used'] = extract_tb(df_san, maps['ds_used'])
-        else:
-            db['ds_used'] = db['ds_cap'] - db['ds_free']
-
-    # Live Optics specific vSAN parsing
-    if df_d is not None and not df_d.empty:
-        if maps['d_host'] != "Not Found" and selected_clusters and "All Clusters" not in selected_clusters and host_to_cluster:
-            def map_lo_cluster(h):
-                if pd.isna(h): return "Unclustered"
-                h = str(h).strip()
-                if h in host_to_cluster: return host_to_cluster[h]
-                h_short = h.split('.')[0]
-                for vh in host_to_cluster:
-                    if vh.startswith(h_short): return host_to_cluster[vh]
-                return "Unclustered"
-            df_d['ClusterMap'] = df_d[maps['d_host']].apply(map_lo_cluster)
-            df_d = df_d[df_d['ClusterMap'].isin(selected_clusters)]
-            
-        if maps['d_model'] != "Not Found" and maps['d_cap'] != "Not Found":
-            bad_keywords = 'BOSS|USB|SD|RAID|PERC|Virtual|DVD|CD-ROM|DELL Disk|Cisco Disk'
-            mask_logical = df_d[maps['d_model']].astype(str).str.contains(bad_keywords, case=False, na=False)
-            df_d['TiB'] = df_d[maps['d_cap']].apply(lambda x: to_float(pd.Series([x])).iloc[0] / 1048576)
-            mask_small = df_d['TiB'] < 0.3 
-            
-            df_clean = df_d[~mask_logical & ~mask_small].copy()
-            if not df_clean.empty:
-                grp = df_clean.groupby([maps['d_model']]).agg({'TiB': 'sum', maps['d_model']: 'count'}).rename(columns={maps['d_model']: 'Count'})
-                winner = grp.loc[grp['TiB'].idxmax()]
-                
-                avg_disks = winner['Count'] / db['cur_host_count'] if db['cur_host_count'] else 0
-                if avg_disks > 1.0:
-                    db['vsan_detected'] = True
-                    db['vsan_raw_tib'] = winner['TiB']
-
-    return db
-
-# --- MAPPING CONFIGURATION ---
-REQ_MAPS = {
-    "vm_name": {"df": "vm", "kws": ['VM Name', 'VM', 'vInfoName', 'Name']},
-    "vm_cluster": {"df": "vm", "kws": ['Cluster', 'vInfoCluster']},
-    "vm_power": {"df": "vm", "kws": ['Power State', 'Powerstate']},
-    "vm_cpu": {"df": "vm", "kws": ['Virtual CPU', 'CPUs', 'vInfoCPUs']},
-    "vm_ram": {"df": "vm", "kws": ['Provisioned Memory', 'Memory', 'vInfoMemory']},
-    "vm_prov": {"df": "vm", "kws": ['Virtual Disk Size', 'Provisioned', 'vInfoProvisioned']},
-    "vm_used": {"df": "vm", "kws": ['Virtual Disk Used', 'In Use', 'vInfoInUse']},
-    
-    "h_name": {"df": "h", "kws": ['Host Name', 'Host', 'vHostName', 'Server']},
-    "h_cluster": {"df": "h", "kws": ['Cluster', 'vHostCluster']},
-    "h_cpu": {"df": "h", "kws": ['CPU Sockets', '# CPU', 'vHostNumCPU', 'Socket']},
-    "h_core": {"df": "h", "kws": ['CPU Cores', 'Cores per CPU', 'vHostCoresPerCPU', 'Cores']},
-    "h_ram": {"df": "h", "kws": ['Memory', '# Memory', 'vHostMemory']},
-    
-    "ds_name": {"df": "ds", "kws": ['Device Name', 'Name', 'vDatastoreName']},
-    "ds_cap": {"df": "ds", "kws": ['Capacity', 'vDatastoreCapacity']},
-    "ds_used": {"df": "ds", "kws": ['Used Capacity', 'Used', 'In Use', 'vDatastoreInUse']},
-    "ds_free": {"df": "ds", "kws": ['Free Capacity', 'Free', 'vDatastoreFreeSpace']},
-    "ds_hosts": {"df": "ds", "kws": ['Server', 'Host', 'Hosts', 'vDatastoreHosts']},
-    "ds_type": {"df": "ds", "kws": ['Device Type', 'Type', 'vDatastoreType']},
-    
-    "d_host": {"df": "d", "kws": ['Server', 'Host']},
-    "d_model": {"df": "d", "kws": ['Model', 'Disk Model']},
-    "d_cap": {"df": "d", "kws": ['Capacity', 'Disk Capacity']}
-}
+            mask |= names.str.contains(term, case=False, regex=False)
+    return mask.to_numpy()
+
+def cluster_picker(clusters, state_key):
+    """Cluster scope from the summary table (one row per cluster): search, grouping by
+    vCenter / Datacenter and bulk include / exclude. Only the shown summary rows go to
+    the browser. The selection lives in session state, so the editor only holds the
+    edits made since its rows last changed."""
+    state = st.session_state.setdefault(state_key, {'chosen': set(clusters.index), 'version': 0})
+    levels = ["Cluster"] + [c for c in ("vCenter", "Datacenter") if c in clusters.columns and clusters[c].nunique() > 1]
+    group = st.radio("Group by", levels, horizontal=True, key=f"{state_key}:group") if len(levels) > 1 else "Cluster"
+    query = st.text_input("Find", key=f"{state_key}:query", placeholder="name, prod-*, *sql*", help="Comma-separated; * ? [ ] match as wildcards.")
+
+    members = clusters.index.to_series(index=clusters.index) if group == "Cluster" else clusters[group].fillna("(unknown)").astype(str)
+    rows = clusters.drop(columns=[c for c in ("vCenter", "Datacenter") if c in clusters.columns]).groupby(members).sum()
+    if group != "Cluster": rows.insert(0, "Clusters", members.value_counts())
+    rows = rows[match_clusters(rows.index, query)]
+    shown = set(members.index[members.isin(rows.index)])
+
+    b1, b2 = st.columns(2)
+    if b1.button("Include shown", key=f"{state_key}:inc", use_container_width=True):
+        state['chosen'] |= shown
+        state['version'] += 1
+    if b2.button("Exclude shown", key=f"{state_key}:exc", use_container_width=True):
+        state['chosen'] -= shown
+        state['version'] += 1
+
+    # The editor starts from the committed selection; a new key (group, query or bulk
+    # action) starts a fresh editor, so earlier edits are already in 'chosen'.
+    editor_key = f"{state_key}:{group}:{query}:{state['version']}"
+    if state.get('editor') != editor_key:
+        state['editor'], state['base'] = editor_key, set(state['chosen'])
+    base = state['base']
+    view = rows.reset_index(names=group)
+    included = pd.Series(members.index.isin(list(base)), index=members.index).groupby(members).all()
+    view.insert(0, "Include", included.reindex(rows.index).to_numpy())
+    view['RAM (GB)'] = view['RAM (GB)'].round()
+    edited = st.data_editor(
+        view, key=editor_key, hide_index=True, height=min(38 + 35 * len(view), 320),
+        disabled=[c for c in view.columns if c != "Include"],
+        column_config={"Include": st.column_config.CheckboxColumn(width="small"), "RAM (GB)": st.column_config.NumberColumn(format="%d")},
+    )
+    chosen = set(base)
+    changed = edited['Include'] != view['Include']
+    for g, on in zip(view.loc[changed, group], edited.loc[changed, 'Include']):
+        grp = set(members.index[members == g])
+        chosen = chosen | grp if on else chosen - grp
+    state['chosen'] = chosen
+    st.caption(f"{len(chosen):,} of {len(clusters):,} clusters included" + (f" · {len(rows):,} {group.lower()} rows shown" if query.strip() else ""))
+    return sorted(chosen)
+
+@st.cache_data(max_entries=16, show_spinner="Placing VMs...")
+def placement_stage(file_hash, maps, clusters, include_off, params, numa, strategy, _df_map):
+    return place_workload(filter_stage(file_hash, maps, clusters, include_off, _df_map), params, numa, strategy)
 
 # --- MAIN APP ---
 st.sidebar.title("⚙️ Parameters")
@@ -496,6 +131,7 @@ st.sidebar.subheader("Target Hardware")
 tgt_sockets = st.sidebar.number_input("Sockets", 1, 4, 2)
 tgt_cores = st.sidebar.number_input("Cores", 4, 128, 24)
 tgt_ram = st.sidebar.number_input("RAM (GB)", 64, 4096, 1024)
+core_ghz = st.sidebar.number_input("Core Clock (GHz)", 1.0, 5.0, 2.5, 0.1, help="Used for demand-based sizing when the export has performance data.")
 host_cap_cores = tgt_sockets * tgt_cores
 
 # 3. CONSTRAINTS
@@ -509,82 +145,83 @@ ha_nodes = st.sidebar.number_input("HA Nodes", 0, 4, 1)
 # 4. SETTINGS
 st.sidebar.divider()
 include_off = st.sidebar.checkbox("Include Powered Off", True)
+low_mem = st.sidebar.checkbox("Low-memory parsing", False, help="Streams the VM tab and keeps only mapped columns (RVTools CSV bundles: only those columns are read); Live Optics performance data is kept as per-VM quantile sketches (±1%). For very large exports; the mapping lists show fewer columns.")
 growth = st.sidebar.number_input("Growth %", 0.0, 100.0, 10.0) / 100
 years = st.sidebar.number_input("Years", 1, 10, 3)
 st.sidebar.divider()
 cust_name = st.sidebar.text_input("Customer", "Client")
 logo_url = st.sidebar.text_input("Logo URL", DEFAULT_LOGO)
+if TABLE_CACHE_DIR: st.sidebar.caption(f"🗄️ {cache_policy(TABLE_CACHE_DIR)}")
 
 # MAIN BODY FILE UPLOAD
 st.title(f"📊 {APP_TITLE}")
-uploaded_files = st.file_uploader("Upload .xlsx Files", type=["xlsx"], accept_multiple_files=True)
+uploaded_files = st.file_uploader("Upload .xlsx Files (or a .zip of RVTools CSVs)", type=["xlsx", "zip"], accept_multiple_files=True)
 
 if uploaded_files:
     try:
         file_map = {f.name: f for f in uploaded_files}
-        sel_file = st.selectbox("Select File:", list(file_map.keys()))
+        consolidate = len(file_map) > 1 and st.toggle("Consolidate all files into one estate", value=False)
         
-        # Load Raw
-        sheets = pd.read_excel(file_map[sel_file], sheet_name=None, header=None, engine='openpyxl')
-        sheets = clean_sheet_names(sheets)
-        
-        # Detect Source & Promote Headers
-        src_type = "Unknown"
-        df_vm = df_h = df_ds = df_d = None
-        
-        if 'vInfo' in sheets:
-            src_type = "RVTools"
-            df_vm = promote_header(sheets['vInfo'], ["VM", "vInfoName", "Powerstate"])
-            df_h = promote_header(sheets.get('vHost', pd.DataFrame()), ["Host", "vHostName"])
-            df_ds = promote_header(sheets.get('vDatastore', pd.DataFrame()), ["Capacity", "vDatastoreCapacity", "Name"])
-            df_d = pd.DataFrame()
-            
-        elif 'VMs' in sheets:
-            src_type = "LiveOptics"
-            df_vm = promote_header(sheets['VMs'], ["VM Name", "Guest Hostname"])
-            df_h = promote_header(sheets.get('ESX Hosts', pd.DataFrame()), ["Host Name", "CPU Cores"])
-            df_ds = promote_header(sheets.get('Host Devices', pd.DataFrame()), ["Device Name", "Capacity"])
-            disk_tab = next((k for k in sheets.keys() if 'disks' in k.lower() and 'vm' not in k.lower()), None)
-            if disk_tab: df_d = promote_header(sheets[disk_tab], ["Model", "Capacity"])
+        if consolidate:
+            # Merged across files; clusters are labelled "<vCenter> / <cluster>"
+            hashes = tuple(file_digest(f) for f in file_map.values())
+            file_hash = hashlib.sha1("|".join(hashes).encode()).hexdigest()
+            try:
+                src_type, df_map, merge_info = parse_merged(hashes, low_mem, list(file_map.values()))
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            source_name = ", ".join(file_map.keys())
+            st.success(f"📂 **{src_type}** — {merge_info['files']} files consolidated across {len(merge_info['vcenters'])} vCenter(s)")
+            dupes = merge_info['duplicates']
+            if any(dupes.values()):
+                st.info(f"Removed duplicates: {dupes.get('vm', 0)} VMs, {dupes.get('h', 0)} hosts, {dupes.get('ds', 0)} datastores.")
         else:
-            st.error("Invalid File Format")
-            st.stop()
+            sel_file = st.selectbox("Select File:", list(file_map.keys()))
             
-        st.success(f"📂 **{src_type}** Detected")
-        
-        df_map = {"vm": df_vm, "h": df_h, "ds": df_ds, "d": df_d}
+            # Load & Promote Headers (cached per file content)
+            file_hash = file_digest(file_map[sel_file])
+            src_type, df_map = parse_workbook(file_hash, low_mem, file_map[sel_file])
+            source_name = sel_file
+            if src_type == "Unknown":
+                st.error("Invalid File Format")
+                st.stop()
+                
+            st.success(f"📂 **{src_type}** Detected")
+        if low_mem: file_hash += ":stream"  # pruned tables: keep their stage caches apart
+        df_vm = df_map["vm"]
 
         # --- DYNAMIC FIELD MAPPING UI ---
         maps = {}
         with mapping_slot.container():
             with st.expander("🛠️ Data Field Mapping", expanded=False):
                 st.caption("If a metric shows 0, fix the column mapping here.")
+                auto_maps = auto_map_scored(df_map)
                 for key, conf in REQ_MAPS.items():
                     df_target = df_map.get(conf["df"])
                     if df_target is not None and not df_target.empty:
                         cols = ["Not Found"] + df_target.columns.tolist()
-                        auto_c = get_col(df_target, conf["kws"])
-                        idx = cols.index(auto_c) if auto_c in cols else 0
-                        maps[key] = st.selectbox(key.replace("_", " ").title(), cols, index=idx, key=f"map_{key}")
+                        auto_col, score = auto_maps[key]
+                        idx = cols.index(auto_col) if auto_col in cols else 0
+                        label = key.replace("_", " ").title() + (" ⚠️" if score < LOW_MATCH_CONFIDENCE else "")
+                        maps[key] = st.selectbox(label, cols, index=idx, key=f"map_{key}", help=f"Auto-match confidence: {score:.0%}")
                     else:
                         maps[key] = "Not Found"
         
         # --- CLUSTER SELECTION ---
         selected_clusters = []
+        summary = summary_stage(file_hash, src_type, maps, df_map)
         with cluster_slot.container():
             st.subheader("Cluster Scope")
             clus_col = maps['vm_cluster']
-            
+
             if clus_col != "Not Found" and df_vm is not None:
-                all_clusters = sorted(df_vm[clus_col].fillna("Unclustered").astype(str).unique())
-                if not all_clusters:
+                clusters = summary.table()
+                if clusters.empty:
                     st.caption("No clusters found. Using global scope.")
                     selected_clusters = ["All Clusters"]
                 else:
-                    st.caption("Check clusters to consolidate:")
-                    for c in all_clusters:
-                        if st.checkbox(f"{c}", value=True, key=f"chk_{c}"):
-                            selected_clusters.append(c)
+                    selected_clusters = cluster_picker(clusters, f"scope:{file_hash}:{clus_col}")
             else:
                 selected_clusters = ["All Clusters"]
                 st.caption("No Cluster column mapped. Using global scope.")
@@ -593,50 +230,17 @@ if uploaded_files:
             st.warning("⚠️ Please select at least one cluster in the sidebar.")
             st.stop()
             
-        # Process Mapped Data
-        db = process_mapped_data(df_vm, df_h, df_ds, df_d, src_type, selected_clusters, include_off, maps)
-        
-        # Sizing Math
-        eff_cores = host_cap_cores * (1 - cpu_buffer/100)
-        eff_ram = tgt_ram * (1 - ram_buffer/100)
-        
-        req_cpu = math.ceil(db['tot_vcpu'] / vcpu_ratio / eff_cores)
-        req_ram = math.ceil(db['tot_ram'] / eff_ram)
-        
-        if req_cpu > req_ram:
-            constraint = "CPU"
-            raw_hosts = req_cpu
-        else:
-            constraint = "RAM"
-            raw_hosts = req_ram
-        
-        mult = (1+growth)**years
-        fut_vcpu = db['tot_vcpu'] * mult
-        fut_hosts = math.ceil(max(fut_vcpu / vcpu_ratio / eff_cores, (db['tot_ram'] * mult) / eff_ram))
-        
-        hosts_now = max(int(raw_hosts) + ha_nodes, min_hosts)
-        hosts_fut = max(int(fut_hosts) + ha_nodes, min_hosts)
-        
-        ratio_now = db['tot_vcpu'] / (hosts_now * host_cap_cores) if hosts_now else 0
-        ratio_fut = fut_vcpu / (hosts_fut * host_cap_cores) if hosts_fut else 0
-
-        # Licensing Calc
-        lic_per_node = calc_license_cores(tgt_sockets, tgt_cores)
-        now_lic = hosts_now * lic_per_node
-        fut_lic = hosts_fut * lic_per_node
+        # Combine the cluster summary for this scope, then size (both cheap, always re-run)
+        db = summary.combine(selected_clusters, include_off)
+        params = SizingParams(tgt_sockets, tgt_cores, tgt_ram, vcpu_ratio, cpu_buffer, ram_buffer, min_hosts, ha_nodes, growth, years, core_ghz)
+        sz = size_workload(db, params)
         
         # Report Pkg
         rpt = db.copy()
-        rpt.update({
-            'src_type': src_type,
-            'hosts_now': hosts_now, 'hosts_fut': hosts_fut, 'constraint': constraint,
-            'raw_hosts': raw_hosts, 'ha_nodes': ha_nodes, 'sockets': tgt_sockets, 'cores': tgt_cores, 'ram': tgt_ram,
-            'tgt_numa_cores': tgt_cores, 'tgt_numa_ram': tgt_ram/tgt_sockets, 'growth': growth, 'years': years,
-            'ratio_now': ratio_now, 'ratio_fut': ratio_fut,
-            'cur_ratio': db['tot_vcpu']/db['cur_cores'] if db['cur_cores'] > 0 else 0,
-            'lo_basis': "95th", 'host_cap_cores': host_cap_cores, 'fut_vcpu': fut_vcpu,
-            'now_lic_cores': now_lic, 'fut_lic_cores': fut_lic, 'lic_diff': fut_lic - db['cur_lic_cores']
-        })
+        rpt['src_type'] = src_type
+        rpt.update(sz)
+        hosts_now, hosts_fut, constraint, raw_hosts = sz['hosts_now'], sz['hosts_fut'], sz['constraint'], sz['raw_hosts']
+        now_lic, fut_lic = sz['now_lic_cores'], sz['fut_lic_cores']
         
         scope_str = ", ".join(selected_clusters) if len(selected_clusters) < 4 else f"{len(selected_clusters)} Clusters Selected"
         
@@ -644,11 +248,11 @@ if uploaded_files:
         safe_cust_name = "".join(c for c in cust_name if c.isalnum() or c in (' ', '-', '_')).strip()
         out_filename = f"{safe_cust_name} - Sizing Report.html"
         
-        html = generate_html_report(rpt, scope_str, file_map[sel_file].name, cust_name, logo_url)
+        html = generate_html_report(rpt, scope_str, source_name, cust_name, logo_url)
         st.sidebar.download_button("Download Full Report", html, file_name=out_filename)
 
         # Dashboard
-        t1, t2 = st.tabs(["📋 Executive Report", "🔍 Raw Data Analysis"])
+        t1, t3, t2 = st.tabs(["📋 Executive Report", "🧮 Scenario Sweep", "🔍 Raw Data Analysis"])
         with t1:
             st.subheader("1. Executive Sizing Recommendation")
             c1, c2 = st.columns(2)
@@ -668,8 +272,8 @@ if uploaded_files:
                 
                 with st.expander("View Sizing Logic"):
                     st.write(f"**1. Workload:** {db['tot_vcpu']:,.0f} vCPU, {db['tot_ram']:,.0f} GB RAM")
-                    st.write(f"**2. Effective Host:** {eff_cores:.1f} Cores, {eff_ram:.1f} GB RAM")
-                    st.write(f"**3. Hosts Needed:** CPU: {req_cpu}, RAM: {req_ram}")
+                    st.write(f"**2. Effective Host:** {sz['eff_cores']:.1f} Cores, {sz['eff_ram']:.1f} GB RAM")
+                    st.write(f"**3. Hosts Needed:** CPU: {sz['req_cpu']}, RAM: {sz['req_ram']}")
                     st.write(f"**4. Constraint:** {constraint} -> {int(raw_hosts)} active nodes")
                     st.write(f"**5. Final:** {int(raw_hosts)} + {ha_nodes} HA = {hosts_now} Hosts")
 
@@ -702,6 +306,9 @@ if uploaded_files:
                 with st.container(border=True):
                     st.markdown(f"#### 🏢 Infrastructure")
                     st.caption("Includes VMFS, NFS, and shared SAN/LUNs (excludes vSAN/VxRail).")
+                    if db['ambiguous_hosts'] and "All Clusters" not in selected_clusters:
+                        amb = db['ambiguous_hosts']
+                        st.warning(f"⚠️ {len(amb)} storage host name(s) match hosts in several clusters; the first match was used: " + "; ".join(f"{h} → {', '.join(c)}" for h, c in list(amb.items())[:5]))
                     st.write(f"**Total Capacity:** {db['ds_cap']:,.1f} TB")
                     st.write(f"**Allocated:** {db['ds_used']:,.1f} TB")
                     st.write(f"**Free:** {db['ds_free']:,.1f} TB")
@@ -732,8 +339,49 @@ if uploaded_files:
                 msg_ram = f"Largest RAM VM: **{db['name_max_ram']}** ({db['max_vm_ram']:.0f} GB)"
                 if is_wide_ram: st.error(f"⚠️ {msg_ram} exceeds NUMA RAM!")
                 else: st.success(f"✅ {msg_ram} fits NUMA RAM.")
-
-            st.subheader("5. Licensing")
+            
+            numa = sz['numa_fit']
+            if numa:
+                st.markdown("#### NUMA Fit (all VMs)")
+                n1, n2, n3 = st.columns(3)
+                n1.metric("Fit One Node", f"{numa['counts']['fits']:,}")
+                n2.metric("Span Nodes", f"{numa['counts']['spans']:,}", help="Wider than one socket's cores or RAM; needs vNUMA-aware placement.")
+                n3.metric("Exceed Host", f"{numa['counts']['exceeds']:,}", help="More vCPU than the host's cores or more RAM than the host.")
+                h1, h2 = st.columns(2)
+                for col, key, title in ((h1, 'cpu_hist', "vCPU per VM"), (h2, 'ram_hist', "RAM per VM")):
+                    hist = numa[key]
+                    col.caption(title)
+                    col.bar_chart(pd.DataFrame({c: hist[c] for c in ("fits", "spans", "exceeds")}, index=pd.Index(hist['bins'], name="bucket")), color=["#28a745", "#f0ad4e", "#d9534f"], sort=False)
+                if numa['offenders']:
+                    with st.expander(f"Top {len(numa['offenders'])} NUMA offenders"):
+                        st.dataframe(pd.DataFrame(numa['offenders']).style.format({'vcpu': "{:,.0f}", 'ram_gb': "{:,.0f}", 'nodes': "{:.1f}"}), hide_index=True)
+
+            st.subheader("5. Placement Simulation")
+            st.caption("Packs each VM onto target hosts (vCPU under the ratio, RAM, optionally NUMA nodes) to expose fragmentation the totals hide.")
+            p1, p2, p3 = st.columns(3)
+            run_place = p1.toggle("Simulate placement", value=False)
+            place_numa = p2.checkbox("Keep VMs within a NUMA node", value=True)
+            place_strategy = p3.radio("Heuristic", ["ffd", "bfd"], horizontal=True, format_func=lambda x: {"ffd": "First-fit", "bfd": "Best-fit"}[x])
+            if run_place:
+                placed = placement_stage(file_hash, maps, tuple(selected_clusters), include_off, params, place_numa, place_strategy, df_map)
+                if placed is None:
+                    st.info("Map VM vCPU and RAM columns to simulate placement.")
+                else:
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Hosts (packed)", f"{placed['hosts']}", f"{placed['hosts'] - hosts_now:+d} vs. totals", delta_color="inverse")
+                    m2.metric("Active Hosts", f"{placed['hosts_packed']}", help=f"Before N+{ha_nodes} HA and the minimum host count.")
+                    m3.metric("Avg CPU Util", f"{placed['avg_cpu_util']:.0%}")
+                    m4.metric("Avg RAM Util", f"{placed['avg_ram_util']:.0%}")
+                    if placed['unplaced_names']:
+                        names = placed['unplaced_names']
+                        st.error(f"⚠️ {len(names)} VM(s) exceed a whole target host and were not placed: {', '.join(names[:10])}{'...' if len(names) > 10 else ''}")
+                    if placed['zero_size_names']:
+                        names = placed['zero_size_names']
+                        st.caption(f"{len(names)} VM(s) with no vCPU or RAM were skipped: {', '.join(names[:10])}{'...' if len(names) > 10 else ''}")
+                    with st.expander("Per-host utilization"):
+                        st.dataframe(placed['host_util'].style.format({'vcpu': "{:,.0f}", 'ram_gb': "{:,.0f}", 'cpu_util': "{:.0%}", 'ram_util': "{:.0%}"}), hide_index=True)
+
+            st.subheader("6. Licensing")
             l1, l2, l3 = st.columns(3)
             with l1:
                 st.metric("Legacy State", f"{db['cur_lic_cores']:,.0f} Cores", f"{db['cur_host_count']} Hosts")
@@ -741,7 +389,77 @@ if uploaded_files:
                 st.metric("Current Refresh", f"{now_lic:,.0f} Cores", f"{hosts_now} Hosts")
             with l3:
                 st.metric("Future w/ Growth", f"{fut_lic:,.0f} Cores", f"Net: {fut_lic - db['cur_lic_cores']:,.0f}")
+            if db['lic_skipped_hosts']:
+                skipped = db['lic_skipped_hosts']
+                st.warning(f"⚠️ {len(skipped)} host(s) excluded from Legacy State: socket/core values could not be read ({', '.join(skipped[:10])}{'...' if len(skipped) > 10 else ''}).")
             
+            if db['has_perf']:
+                st.divider()
+                st.subheader("7. Performance (Live Optics)")
+                basis = "VMs" if db['perf_basis'] == 'vm' else "Hosts"
+                st.caption(f"{db['perf_samples']:,} samples from {db['perf_entities']:,} {basis}, {db['perf_start']:%Y-%m-%d %H:%M} to {db['perf_end']:%Y-%m-%d %H:%M}.")
+                p1, p2, p3 = st.columns(3)
+                p1.metric(f"CPU Demand ({sz['lo_basis']})", f"{db['perf_ghz_demand']:,.1f} GHz", f"{db['tot_vcpu']:,.0f} vCPU allocated", delta_color="off")
+                p2.metric(f"Memory Demand ({sz['lo_basis']})", f"{db['perf_mem_demand']:,.0f} GB", f"{db['tot_ram']:,.0f} GB allocated", delta_color="off")
+                p3.metric("Hosts by Demand", sz['perf_hosts_rec'], f"{sz['perf_hosts_rec'] - hosts_now:+d} vs. allocation", delta_color="inverse")
+                stats, summed = db['perf_stats'], db['perf_stats_sum']
+                rows = {"CPU (GHz)": stats['cpu_ghz'], "Memory (GB)": stats['mem_gb']}
+                if db['perf_coincident']:
+                    rows.update({"CPU, sum of per-VM (GHz)": summed['cpu_ghz'], "Memory, sum of per-VM (GB)": summed['mem_gb']})
+                    st.caption("Demand is coincident: every VM is aligned on one time grid and the percentile is taken over the per-timestamp total. The sum of each VM's own percentile is shown for comparison.")
+                else:
+                    st.caption("Low-memory parsing keeps no timeline, so demand is the sum of each VM's own percentile (an upper bound).")
+                st.dataframe(pd.DataFrame(rows).T.rename(columns={'p95': "95th", 'p99': "99th", 'peak': "Peak"}).style.format("{:,.1f}"))
+                if len(db['perf_clusters']) > 1:
+                    with st.expander("Coincident 95th per cluster"):
+                        st.dataframe(db['perf_clusters'].rename(columns={'cpu_ghz': "CPU (GHz)", 'mem_gb': "Memory (GB)"}).style.format("{:,.1f}"))
+            
+        with t3:
+            st.caption("Every combination below is sized at once with the sidebar buffers, minimum hosts and growth.")
+            w1, w2, w3 = st.columns(3)
+            sw_sockets = w1.multiselect("Sockets", [1, 2, 4], default=sorted({*SWEEP_DEFAULTS['sockets'], tgt_sockets}))
+            sw_cores = w2.multiselect("Cores per Socket", [8, 12, 16, 20, 24, 28, 32, 36, 48, 56, 64, 96, 128], default=sorted({*SWEEP_DEFAULTS['cores'], tgt_cores}))
+            sw_ram = w3.multiselect("RAM (GB)", [256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096], default=sorted({*SWEEP_DEFAULTS['ram_gb'], tgt_ram}))
+            w4, w5, w6 = st.columns(3)
+            sw_ratio = w4.multiselect("Max vCPU:pCPU", [2.0, 3.0, 4.0, 5.0, 6.0, 8.0], default=sorted({*SWEEP_DEFAULTS['vcpu_ratio'], vcpu_ratio}))
+            sw_ha = w5.multiselect("HA Nodes", [0, 1, 2], default=[ha_nodes] if ha_nodes in (0, 1, 2) else [1])
+            sw_rank = w6.radio("Rank by", ["license", "hosts", "headroom"], format_func=lambda r: {"license": "Licensed cores", "hosts": "Host count", "headroom": "Headroom"}[r])
+            
+            if all([sw_sockets, sw_cores, sw_ram, sw_ratio, sw_ha]):
+                sweep = sweep_scenarios(db, params, sw_rank, sockets=sw_sockets, cores=sw_cores, ram_gb=sw_ram, vcpu_ratio=sw_ratio, ha_nodes=sw_ha)
+                st.write(f"**{len(sweep):,} scenarios** — top 25:")
+                show = sweep[['sockets', 'cores', 'ram_gb', 'vcpu_ratio', 'ha_nodes', 'hosts_now', 'hosts_fut', 'constraint', 'now_lic_cores', 'fut_lic_cores', 'headroom']]
+                st.dataframe(show.head(25).style.format({'headroom': "{:.0%}", 'vcpu_ratio': "{:.1f}"}), hide_index=True)
+                st.download_button("Download all scenarios (CSV)", sweep.to_csv(index=False), file_name=f"{safe_cust_name} - Scenarios.csv")
+            else:
+                st.info("Pick at least one value in every field.")
+            
+            st.divider()
+            st.markdown("#### 🏷️ Catalog Optimizer")
+            st.caption("Orderable SKUs with their DIMM-feasible RAM sizes and relative cost (base + per GB). Ratio, buffers, min hosts and HA come from the sidebar.")
+            catalog = st.data_editor(
+                pd.DataFrame([{**r, 'ram_gb': ", ".join(str(x) for x in r['ram_gb'])} for r in EXAMPLE_CATALOG]),
+                num_rows="dynamic", hide_index=True, key="catalog",
+            )
+            o1, o2, o3 = st.columns(3)
+            opt_obj = o1.radio("Minimize", ["cost", "license"], format_func=lambda o: {"cost": "Total cost", "license": "Licensed cores"}[o])
+            core_price = o2.number_input("License cost per core (relative)", 0.0, 100.0, 0.0, 0.01)
+            opt_horizon = o3.radio("Size for", ["now", "future"], format_func=lambda h: {"now": "Current workload", "future": f"+{growth*100:.0f}% / {years} yrs"}[h])
+            try:
+                best = optimize_catalog(db, catalog, params, opt_obj, core_price, opt_horizon, top=10)
+            except ValueError as e:
+                st.error(str(e))
+                best = None
+            if best is None:
+                pass
+            elif best.empty:
+                st.info("No valid catalog rows.")
+            else:
+                top_cfg = best.iloc[0]
+                st.success(f"**Best:** {top_cfg['sku']} with {top_cfg['ram_gb']:.0f} GB × {top_cfg['hosts']} hosts (N+{ha_nodes}) — {top_cfg['lic_cores']:,} licensed cores, cost {top_cfg['total_cost']:,.1f}")
+                st.dataframe(best.style.format({'ram_gb': "{:.0f}", 'cost': "{:.2f}", 'total_cost': "{:,.1f}"}), hide_index=True)
+                st.caption(f"{best.attrs['catalog_rows']:,} SKU/RAM combinations scored.")
+
         with t2:
             st.write("Source Data Preview")
             if df_vm is not None:
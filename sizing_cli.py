@@ -0,0 +1,171 @@
+"""Batch sizing: size a folder (or glob) of RVTools / Live Optics exports in parallel.
+Inputs may be .xlsx workbooks or RVTools CSV bundles (a .zip or folder of tab CSVs).
+
+    python sizing_cli.py exports/ --out results --cores 32 --ram 1024 --ratio 4
+
+Writes sizing_results.csv (one row per file, keyed by its full path) and one HTML report
+per file.
+With --merge all exports are consolidated and sized as one estate (one row, one report).
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from sizing_engine import (
+    CACHE_MAX_AGE_DAYS, CACHE_MAX_BYTES, DEFAULT_LOGO, SizingParams, csv_bundle_tabs, default_cache_dir, generate_html_report, size_export, size_merged,
+)
+
+RESULT_COLUMNS = [
+    'file', 'status', 'src_type', 'tot_vms', 'tot_vcpu', 'tot_ram', 'vinfo_prov', 'vinfo_used',
+    'cur_host_count', 'cur_cores', 'cur_lic_cores', 'hosts_now', 'hosts_fut', 'constraint',
+    'ratio_now', 'ratio_fut', 'now_lic_cores', 'fut_lic_cores', 'lic_diff', 'numa_spans', 'numa_exceeds',
+    'perf_ghz_demand', 'perf_hosts_rec',
+    'ds_cap', 'ds_free', 'vsan_detected', 'vsan_raw_tib', 'report',
+]
+
+def find_exports(inputs):
+    """Expands folders and glob patterns to a sorted, de-duplicated list of exports:
+    .xlsx workbooks, .zip RVTools CSV bundles, and folders holding RVTools tab CSVs."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            if csv_bundle_tabs(os.listdir(item)):
+                found.add(os.path.abspath(item))
+                continue
+            item = os.path.join(item, "*")
+        for p in glob.glob(item):
+            if os.path.basename(p).startswith("~$"): continue
+            if p.lower().endswith((".xlsx", ".zip")) or (os.path.isdir(p) and csv_bundle_tabs(os.listdir(p))):
+                found.add(os.path.abspath(p))
+    return sorted(found)
+
+def safe_name(name):
+    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
+
+def report_name(path):
+    """Report file name for one export: its stem plus a short hash of the absolute path,
+    so same-named exports from different folders never overwrite each other."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return f"{safe_name(stem)} - {tag} - Sizing Report.html"
+
+def size_one(path, params, include_off, out_dir, customer, logo_url, streaming=False, cache_dir=None):
+    """Worker: sizes one export and writes its HTML report. Never raises; failures become a status row."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    row = {'file': path}
+    try:
+        res = size_export(path, params, include_off=include_off, streaming=streaming, cache_dir=cache_dir)
+        report_path = os.path.join(out_dir, report_name(path))
+        html = generate_html_report(res.report, res.scope_name, os.path.basename(path), customer or stem, logo_url)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        row.update({k: res.report.get(k) for k in RESULT_COLUMNS if k in res.report})
+        row.update({'status': "ok", 'report': os.path.basename(report_path)})
+    except Exception as e:
+        row.update({'status': f"error: {e}", 'traceback': traceback.format_exc()})
+    return row
+
+def size_all(paths, params, include_off, out_dir, customer, logo_url, workers, streaming=False, cache_dir=None):
+    """Consolidated run: one merged sizing over every export."""
+    name = customer or "Consolidated"
+    row = {'file': f"{len(paths)} files (merged)"}
+    try:
+        res = size_merged(paths, params, include_off=include_off, max_workers=workers, streaming=streaming, cache_dir=cache_dir)
+        report_path = os.path.join(out_dir, f"{safe_name(name)} - Sizing Report.html")
+        sources = ", ".join(os.path.basename(p) for p in paths)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(generate_html_report(res.report, res.scope_name, sources, name, logo_url))
+        row.update({k: res.report.get(k) for k in RESULT_COLUMNS if k in res.report})
+        row.update({'status': "ok", 'report': os.path.basename(report_path)})
+        dupes = res.report['merge']['duplicates']
+        print(f"Merged {len(paths)} exports; removed {dupes.get('vm', 0)} duplicate VMs.", file=sys.stderr)
+    except Exception as e:
+        row.update({'status': f"error: {e}", 'traceback': traceback.format_exc()})
+    return row
+
+def size_each(files, params, args):
+    """One sizing per export, in parallel."""
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(size_one, p, params, not args.exclude_off, args.out, args.customer, args.logo, args.stream, args.cache_dir) for p in files]
+        for i, fut in enumerate(as_completed(futures), 1):
+            row = fut.result()
+            rows.append(row)
+            print(f"[{i}/{len(files)}] {row['file']}: {row['status']}", file=sys.stderr)
+            tb = row.pop('traceback', None)
+            if tb and args.verbose:
+                print(tb, file=sys.stderr)
+    return rows
+
+def build_parser():
+    d = SizingParams()
+    ap = argparse.ArgumentParser(description="Size a directory or glob of RVTools / Live Optics exports (.xlsx or RVTools CSV .zip).")
+    ap.add_argument("inputs", nargs="+", help="Folders and/or glob patterns (e.g. 'exports/*.xlsx'). A folder of tab CSVs is one export.")
+    ap.add_argument("--out", default="sizing_results", help="Output folder for the results table and HTML reports.")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    ap.add_argument("--merge", action="store_true", help="Consolidate all exports into one estate and size it once.")
+    ap.add_argument("--stream", action="store_true", help="Low-memory parsing: stream the VM tab and read CSV bundles keeping only auto-mapped columns.")
+    ap.add_argument("--cache-dir", default=default_cache_dir(), help=f"Parsed-table cache folder (default: ~/.cache/host-sizing or $SIZING_CACHE_DIR). It holds parsed customer inventory; entries unused for {CACHE_MAX_AGE_DAYS} days or beyond {CACHE_MAX_BYTES >> 30} GB are pruned.")
+    ap.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None, help="Always re-parse the workbooks.")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Print tracebacks for files that fail.")
+
+    hw = ap.add_argument_group("target hardware")
+    hw.add_argument("--sockets", type=int, default=d.sockets)
+    hw.add_argument("--cores", type=int, default=d.cores, help="Cores per socket.")
+    hw.add_argument("--ram", type=int, default=d.ram_gb, help="RAM per host (GB).")
+    hw.add_argument("--ghz", type=float, default=d.core_ghz, help="Core clock (GHz), for demand-based sizing from Live Optics performance data.")
+
+    c = ap.add_argument_group("constraints")
+    c.add_argument("--ratio", type=float, default=d.vcpu_ratio, help="Max vCPU:pCPU.")
+    c.add_argument("--cpu-buffer", type=float, default=d.cpu_buffer, help="CPU buffer %%.")
+    c.add_argument("--ram-buffer", type=float, default=d.ram_buffer, help="RAM buffer %%.")
+    c.add_argument("--min-hosts", type=int, default=d.min_hosts)
+    c.add_argument("--ha-nodes", type=int, default=d.ha_nodes)
+
+    s = ap.add_argument_group("settings")
+    s.add_argument("--exclude-off", action="store_true", help="Exclude powered-off VMs.")
+    s.add_argument("--growth", type=float, default=d.growth * 100, help="Annual growth %%.")
+    s.add_argument("--years", type=int, default=d.years)
+    s.add_argument("--customer", default=None, help="Customer name for reports (default: file name).")
+    s.add_argument("--logo", default=DEFAULT_LOGO, help="Logo URL for reports.")
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = find_exports(args.inputs)
+    if not files:
+        print("No exports found.", file=sys.stderr)
+        return 1
+
+    params = SizingParams(
+        sockets=args.sockets, cores=args.cores, ram_gb=args.ram, vcpu_ratio=args.ratio,
+        cpu_buffer=args.cpu_buffer, ram_buffer=args.ram_buffer, min_hosts=args.min_hosts,
+        ha_nodes=args.ha_nodes, growth=args.growth / 100, years=args.years, core_ghz=args.ghz,
+    )
+    os.makedirs(args.out, exist_ok=True)
+
+    if args.merge:
+        row = size_all(files, params, not args.exclude_off, args.out, args.customer, args.logo, args.workers, args.stream, args.cache_dir)
+        print(f"{row['file']}: {row['status']}", file=sys.stderr)
+        tb = row.pop('traceback', None)
+        if tb and args.verbose:
+            print(tb, file=sys.stderr)
+        rows = [row]
+    else:
+        rows = size_each(files, params, args)
+
+    df = pd.DataFrame(rows).reindex(columns=RESULT_COLUMNS).sort_values('file')
+    out_csv = os.path.join(args.out, "sizing_results.csv")
+    df.to_csv(out_csv, index=False)
+    failed = (df['status'] != "ok").sum()
+    print(f"Sized {len(df) - failed}/{len(df)} exports -> {out_csv}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2122 @@
+"""Sizing engine: workbook parsing, aggregation, sizing math and the HTML report.
+
+Importable without Streamlit so exports can be sized from scripts and batch jobs;
+sizing_app.py is the interactive front end over the same functions.
+"""
+import pandas as pd
+import numpy as np
+import math
+import hashlib
+import bisect
+import csv
+import functools
+import io
+import itertools
+import json
+import os
+import re
+import zipfile
+import shutil
+import tempfile
+import time
+import openpyxl
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather  # ships with streamlit
+    HAS_ARROW = True
+    ARROW_ERRORS = (pa.ArrowException,)  # e.g. ArrowNotImplementedError derives from none of the builtins below
+except ImportError:
+    HAS_ARROW = False
+    ARROW_ERRORS = ()
+
+APP_TITLE = "Virtualization Sizing Calculator"
+DEFAULT_LOGO = "https://placehold.co/200x50/004B87/ffffff?text=AHEAD"
+
+# --- UTILS ---
+# Number with optional thousands separators and a trailing unit word, e.g. "1,024" or "512 GB".
+NUM_CELL_RE = r'^\s*([-+]?[\d,]*\.?\d+(?:[eE][-+]?\d+)?)\s*[A-Za-z%]*\s*$'
+
+def parse_float(series):
+    """Converts a series to float64. Numeric columns pass straight through; in object
+    columns real numbers are taken as-is and only the string cells that don't parse
+    directly are cleaned (thousands separators, unit suffixes). Unparseable cells become NaN."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype('float64')
+    vals = pd.to_numeric(series, errors='coerce').astype('float64')
+    retry = vals.isna() & series.notna()
+    if retry.any():
+        num = series[retry].astype(str).str.extract(NUM_CELL_RE, expand=False)
+        vals[retry] = pd.to_numeric(num.str.replace(',', '', regex=False), errors='coerce')
+    return vals
+
+def to_float(series):
+    """Safely converts a series to float, handling commas and strings."""
+    if series is None: return 0.0
+    return parse_float(series).fillna(0)
+
+# Header rows are searched for in the top rows of a tab only.
+HEADER_SCAN_ROWS = 20
+
+@functools.lru_cache(maxsize=None)
+def header_matcher(keywords):
+    """One case-insensitive regex for a tuple of header keywords."""
+    return re.compile("|".join(re.escape(k) for k in keywords), re.IGNORECASE)
+
+def find_header_row(rows, keywords):
+    """Index of the first row whose joined cells contain a header keyword, else 0.
+    Rows are any sequences of cell values (frame slice, openpyxl rows, CSV lines)."""
+    matcher = header_matcher(tuple(keywords))
+    for i, row in enumerate(rows):
+        if matcher.search(" ".join("" if pd.isna(v) else str(v) for v in row)): return i
+    return 0
+
+def promote_header(df, keywords):
+    """Scans the top rows for a header row containing specific keywords and makes it
+    the column names. The body is a positional slice, not a copy."""
+    if df.empty: return df
+    top = df.iloc[:HEADER_SCAN_ROWS].to_numpy(dtype=object)
+    i = find_header_row(top, keywords)
+    header = pd.Index(["" if pd.isna(v) else str(v).strip() for v in top[i]])
+    body = df.iloc[i+1:]
+    return body.set_axis(header, axis=1).set_axis(pd.RangeIndex(len(body)), axis=0)
+
+def get_col(df, keywords):
+    """Finds a column name: Prioritizes EXACT match, then falls back to PARTIAL match."""
+    if df is None or df.empty: return None
+    return match_col(df.columns, keywords)
+
+def match_col(columns, keywords):
+    """get_col over a plain list of column names (used before a frame exists)."""
+    return column_index(tuple(columns)).match(keywords)[0]
+
+# Partial matches skipped for a keyword when the column name contains one of these.
+PARTIAL_EXCLUDES = {
+    'capacity': ('cluster',),
+    'cluster': ('rule', 'capacity', 'free', 'space', 'id'),
+}
+
+# Unit decorations ignored when scoring partial matches ("In Use MiB", "Capacity (MiB)").
+UNIT_SUFFIX_RE = r'\s*(\([^)]*\)|\b(?:[kmgt]i?b|bytes)\b)\s*'
+
+class ColumnIndex:
+    """Normalized column names of one table, built once and shared by every lookup.
+
+    match() keeps get_col's rules: an exact (case/space-insensitive) match on any
+    keyword wins, in keyword order; otherwise the first column containing a keyword,
+    again in keyword order, minus the PARTIAL_EXCLUDES. It also returns a confidence:
+    exact matches score near 1, partial ones by how much of the name (less any unit
+    suffix) the keyword covers, and each fallback keyword costs a little.
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.norm = [str(c).strip().lower() for c in self.columns]
+        self.exact = {}
+        for c, n in zip(self.columns, self.norm):
+            self.exact.setdefault(n, c)
+        self._memo = {}
+    
+    def match(self, keywords):
+        """(column or None, confidence 0-1) for a keyword list."""
+        if isinstance(keywords, str): keywords = [keywords]
+        key = tuple(keywords)
+        if key in self._memo: return self._memo[key]
+        
+        kws = [k.lower() for k in keywords]
+        hit = next(((self.exact[k], max(1.0 - 0.05 * r, 0.8)) for r, k in enumerate(kws) if k in self.exact), None)
+        if hit is None:
+            for r, k in enumerate(kws):
+                bad = PARTIAL_EXCLUDES.get(k, ())
+                j = next((j for j, n in enumerate(self.norm) if k in n and not any(b in n for b in bad)), None)
+                if j is not None:
+                    cover = len(k) / max(len(re.sub(UNIT_SUFFIX_RE, '', self.norm[j])), len(k))
+                    hit = (self.columns[j], round(max(0.3 + 0.4 * cover - 0.05 * r, 0.1), 2))
+                    break
+        self._memo[key] = hit or (None, 0.0)
+        return self._memo[key]
+
+@functools.lru_cache(maxsize=64)
+def column_index(columns):
+    """ColumnIndex for a tuple of column names (one per distinct table layout)."""
+    return ColumnIndex(columns)
+
+def unit_factor_gb(col_name):
+    """Multiplier from a column's unit (inferred from its name) to GB."""
+    cl = str(col_name).lower()
+    if 'tb' in cl or 'tib' in cl: return 1024
+    if 'gb' in cl or 'gib' in cl: return 1
+    if 'kb' in cl or 'kib' in cl: return 1 / 1048576
+    if 'bytes' in cl or ' b' in cl: return 1 / 1073741824
+    return 1 / 1024  # Default assume MB/MiB
+
+MIN_LIC_CORES_PER_SOCKET = 16
+
+def calc_license_cores(sockets, cores_per_socket):
+    """Billable cores with the per-socket minimum. Accepts scalars or arrays/Series."""
+    billable_per_socket = np.maximum(cores_per_socket, MIN_LIC_CORES_PER_SOCKET)
+    return sockets * billable_per_socket
+
+def host_license_cores(df_h, source_type):
+    """Vectorized legacy licensed cores per host of the typed host table. RVTools reports
+    cores per socket, Live Optics reports total cores per host. Returns (cores, bad):
+    hosts whose sockets/cores could not be parsed are flagged in bad and count 0."""
+    sockets, cores = df_h['h_cpu'], df_h['h_core']
+    if source_type == "RVTools":
+        bad = sockets.isna() | cores.isna()
+        per_socket = cores
+    else:
+        bad = sockets.isna() | cores.isna() | (sockets <= 0)
+        per_socket = cores / sockets.where(~bad)
+    return calc_license_cores(sockets, per_socket).where(~bad, 0.0), bad
+
+def legacy_license_cores(df_h, source_type):
+    """Legacy licensed cores over the typed host table. Returns (total, hosts skipped
+    because sockets/cores could not be parsed)."""
+    cores, bad = host_license_cores(df_h, source_type)
+    labels = df_h['h_name'] if 'h_name' in df_h else df_h.index.to_series()
+    return float(cores.sum()), [str(x) for x in labels[bad]]
+
+def file_digest(file):
+    """SHA-1 of an uploaded file object, a path on disk, or a folder (CSV bundle)."""
+    h = hashlib.sha1()
+    if hasattr(file, 'getvalue'):
+        h.update(file.getvalue())
+    elif os.path.isdir(file):
+        for name in sorted(os.listdir(file)):
+            h.update(name.encode())
+            h.update(file_digest(os.path.join(file, name)).encode())
+    else:
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''): h.update(chunk)
+    return h.hexdigest()
+
+# --- LOADERS ---
+SOURCE_SHEETS = {
+    "RVTools": ['vInfo', 'vHost', 'vDatastore'],
+    "LiveOptics": ['VMs', 'ESX Hosts', 'Host Devices'],
+}
+
+def find_disk_tab(sheet_names):
+    """Live Optics host disk tab (e.g. 'ESX Host Disks'), skipping the per-VM disk tab."""
+    return next((k for k in sheet_names if 'disks' in k.lower() and 'vm' not in k.lower()), None)
+
+def detect_source(sheet_names):
+    if 'vInfo' in sheet_names: return "RVTools"
+    if 'VMs' in sheet_names: return "LiveOptics"
+    return "Unknown"
+
+# Keywords promote_header looks for in each tab's header row.
+HEADER_KWS = {
+    'vInfo': ["VM", "vInfoName", "Powerstate"],
+    'vHost': ["Host", "vHostName"],
+    'vDatastore': ["Capacity", "vDatastoreCapacity", "Name"],
+    'VMs': ["VM Name", "Guest Hostname"],
+    'ESX Hosts': ["Host Name", "CPU Cores"],
+    'Host Devices': ["Device Name", "Capacity"],
+    'disks': ["Model", "Capacity"],
+}
+
+def read_source_sheets(file, streaming=False):
+    """Reads the sheet index first, then parses only the tabs the detected source needs.
+    With streaming=True the VM tab is row-streamed by stream_sheet and comes back
+    with its header already promoted. Live Optics performance tabs are always streamed
+    and come back as (scope, (entities, samples)) pairs under 'perf': typed samples
+    (read_perf_sheet), or per-entity sketches (sketch_perf_sheet) when streaming."""
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    with pd.ExcelFile(wb, engine='openpyxl') as xls:
+        names = {n.strip(): n for n in xls.sheet_names}
+        src_type = detect_source(names)
+        if src_type == "Unknown": return src_type, {}
+        
+        wanted = list(SOURCE_SHEETS[src_type])
+        if src_type == "LiveOptics":
+            disk_tab = find_disk_tab(names)
+            if disk_tab: wanted.append(disk_tab)
+        
+        vm_tab = wanted[0]
+        sheets = {}
+        for k in wanted:
+            if k not in names: continue
+            if streaming and k == vm_tab:
+                sheets[k] = stream_sheet(wb[names[k]], HEADER_KWS[k])
+            else:
+                sheets[k] = xls.parse(names[k], header=None)
+        if src_type == "LiveOptics":
+            read_perf = sketch_perf_sheet if streaming else read_perf_sheet
+            sheets['perf'] = [(scope, read_perf(wb[names[k]])) for k, scope in perf_tabs(names).items()]
+    return src_type, sheets
+
+# --- STREAMING VM TAB ---
+# Large vInfo tabs (~90 columns, hundreds of thousands of rows) are too big to hold as
+# an all-object frame. Streaming keeps only the columns the mapping and consolidation
+# can pick and stores numeric ones as float arrays while the rows go by.
+def stream_columns(header, df_key="vm"):
+    """Columns of a tab worth keeping: auto-mapped REQ_MAPS picks plus the vCenter and
+    de-duplication key columns used when merging. Returns [(index, name, is_numeric)]."""
+    picks = {}
+    for key, conf in REQ_MAPS.items():
+        if conf["df"] == df_key:
+            col = match_col(header, conf["kws"])
+            if col: picks[col] = picks.get(col, False) or "type" in conf
+    for kws in (VCENTER_KWS, DEDUP_KWS.get(df_key)):
+        col = match_col(header, kws) if kws else None
+        if col: picks.setdefault(col, False)
+    return sorted((header.index(c), c, num) for c, num in picks.items())
+
+def stream_sheet(ws, header_kws, columns=stream_columns):
+    """A whole tab as one frame (see stream_chunks)."""
+    return next(stream_chunks(ws, header_kws, columns), pd.DataFrame())
+
+def stream_chunks(ws, header_kws, columns=stream_columns, chunk_rows=None):
+    """Promotes the header like promote_header (first of the top rows containing a
+    keyword, else row 0) and builds the columns picked by `columns(header)` row by row.
+    Numeric cells go straight into float arrays; the few text cells in numeric columns
+    ("1,024") are parsed afterwards with parse_float. Yields frames of up to chunk_rows
+    rows, or the whole tab as one frame when chunk_rows is None."""
+    ws.reset_dimensions()
+    rows = ws.iter_rows(values_only=True)
+    head = list(itertools.islice(rows, HEADER_SCAN_ROWS))
+    if not head: return
+    
+    hdr = find_header_row(head, header_kws)
+    header = ["" if v is None else str(v).strip() for v in head[hdr]]
+    keep = columns(header)
+    
+    def frame(data, fixups, last):
+        cols = {}
+        for (_, name, num), buf, fix in zip(keep, data, fixups):
+            if name in cols: continue
+            if num:
+                vals = np.frombuffer(buf, dtype='float64')[:last].copy()
+                fix = {i: v for i, v in fix.items() if i < last}
+                if fix:
+                    vals[list(fix)] = parse_float(pd.Series(list(fix.values()), dtype=object)).to_numpy()
+                cols[name] = vals
+            else:
+                cols[name] = pd.Series(buf[:last], dtype=object)
+        return pd.DataFrame(cols)
+    
+    def buffers():
+        return [array('d') if num else [] for _, _, num in keep], [{} if num else None for _, _, num in keep]
+    
+    data, fixups = buffers()
+    n = last = 0
+    for row in itertools.chain(head[hdr + 1:], rows):
+        width = len(row)
+        for (j, _, num), buf, fix in zip(keep, data, fixups):
+            v = row[j] if j < width else None
+            if not num:
+                buf.append(v)
+            elif isinstance(v, (int, float)):
+                buf.append(v)
+            else:
+                buf.append(np.nan)
+                if v is not None: fix[n] = v
+        n += 1
+        if any(v is not None for v in row): last = n
+        if n == chunk_rows:
+            yield frame(data, fixups, n)
+            data, fixups = buffers()
+            n = last = 0
+    
+    # Trailing blank rows are dropped, as read_excel does
+    if chunk_rows is None or last:
+        yield frame(data, fixups, last)
+
+# --- LIVE OPTICS PERFORMANCE ---
+# Performance tabs ("VM Performance", "ESX Performance", ...) hold one row per entity
+# per sample. They are streamed into two compact tables: 'perf_ent' (one row per VM or
+# host: scope, name) and 'perf' (one row per sample: entity code, time, CPU GHz and
+# memory GB as float32), so multi-week collections stay a few bytes per sample.
+PERF_TAB_RE = re.compile(r'perf', re.IGNORECASE)
+PERF_HEADER_KWS = ["Timestamp", "Sample Time", "Time"]
+PERF_KWS = {
+    'name': ['VM Name', 'Host Name', 'Name', 'VM', 'Host', 'Server'],
+    'time': ['Timestamp', 'Sample Time', 'Time', 'Date'],
+    'cpu': ['CPU (GHz)', 'CPU GHz', 'CPU Usage (GHz)', 'CPU (MHz)', 'CPU Usage', 'CPU'],
+    'mem': ['Memory (GB)', 'Memory Used', 'Memory Usage', 'Active Memory', 'Memory'],
+}
+PERF_QUANTILES = {'p95': 0.95, 'p99': 0.99, 'peak': 1.0}
+
+def perf_tabs(sheet_names):
+    """{tab: 'vm' | 'host'} for the performance tabs of a Live Optics workbook."""
+    return {n: ('vm' if 'vm' in n.lower() else 'host') for n in sheet_names if PERF_TAB_RE.search(n)}
+
+def perf_columns(header):
+    """stream_sheet column picker for a performance tab: name, time, CPU and memory."""
+    picks = {k: match_col(header, kws) for k, kws in PERF_KWS.items()}
+    if not picks['name'] or not picks['time']: return []
+    return sorted((header.index(c), c, k in ('cpu', 'mem')) for k, c in picks.items() if c)
+
+def perf_frame(df):
+    """Types one raw chunk of a performance tab: name, time, cpu_ghz, mem_gb (empty if
+    the tab has no name/time columns). CPU in MHz and memory in MB/KB are converted by header."""
+    cols = {k: match_col(df.columns, kws) for k, kws in PERF_KWS.items()}
+    if df.empty or not cols['name'] or not cols['time']: return pd.DataFrame()
+    
+    out = pd.DataFrame({
+        'name': df[cols['name']].astype(str).str.strip(),
+        'time': pd.to_datetime(df[cols['time']], errors='coerce'),
+        'cpu_ghz': parse_float(df[cols['cpu']]) * (0.001 if 'mhz' in cols['cpu'].lower() else 1) if cols['cpu'] else np.nan,
+        'mem_gb': parse_float(df[cols['mem']]) * unit_factor_gb(cols['mem']) if cols['mem'] else np.nan,
+    })
+    return out[out['time'].notna() & df[cols['name']].notna().to_numpy()]
+
+def perf_chunks(ws, index):
+    """Typed chunks of a performance tab (see perf_frame), PERF_CHUNK_ROWS rows at a time,
+    with each sample's entity code. `index` (name -> code) grows as entities appear, so
+    codes are stable across chunks. Yields (frame, codes)."""
+    for chunk in stream_chunks(ws, PERF_HEADER_KWS, perf_columns, PERF_CHUNK_ROWS):
+        df = perf_frame(chunk)
+        if df.empty: continue
+        inv, uniq = pd.factorize(df['name'])
+        yield df, np.array([index.setdefault(u, len(index)) for u in uniq], dtype='int32')[inv]
+
+def read_perf_sheet(ws):
+    """One performance tab as (entities, samples): entity names, and per sample its
+    entity code, time, CPU GHz and memory GB (float32). Typed a chunk at a time, so
+    only one chunk of raw cells is ever held."""
+    index, parts = {}, []
+    for df, codes in perf_chunks(ws, index):
+        parts.append(pd.DataFrame({
+            'entity': codes, 'time': df['time'].to_numpy(dtype='datetime64[ns]'),
+            'cpu_ghz': df['cpu_ghz'].to_numpy(dtype='float32'), 'mem_gb': df['mem_gb'].to_numpy(dtype='float32'),
+        }))
+    if not index: return pd.DataFrame(), None
+    return pd.DataFrame({'name': pd.Series(list(index), dtype=object)}), pd.concat(parts, ignore_index=True)
+
+def sketch_perf_sheet(ws):
+    """One performance tab folded into per-entity quantile sketches PERF_CHUNK_ROWS rows
+    at a time. Each chunk is merged into running sketch and span accumulators, so memory
+    is bounded by entities x buckets, not by the number of samples. Returns (entities,
+    sketch): entities has name, first, last and samples per VM/host; sketch is as sketch_merge."""
+    index, st, sk = {}, None, None
+    for df, codes in perf_chunks(ws, index):
+        span = df['time'].groupby(codes).agg(['min', 'max', 'size'])
+        st = span if st is None else pd.concat([st, span]).groupby(level=0).agg({'min': 'min', 'max': 'max', 'size': 'sum'})
+        part = sketch_samples(codes, df['cpu_ghz'].to_numpy(), df['mem_gb'].to_numpy())
+        sk = part if sk is None else sketch_merge([sk, part])
+    if not index: return pd.DataFrame(), None
+    
+    st = st.reindex(range(len(index)))
+    ent = pd.DataFrame({'name': pd.Series(list(index), dtype=object), 'first': st['min'].to_numpy(dtype='datetime64[ns]'),
+                        'last': st['max'].to_numpy(dtype='datetime64[ns]'), 'samples': st['size'].to_numpy(dtype='int64')})
+    return ent, sk
+
+def fold_entities(ent, keys, perf=None, sketch=None, drop_overlaps=False):
+    """Folds entity rows sharing a key into the first of them: raw samples move to its
+    code and sketches are merged (adding counts). With drop_overlaps, a copy whose time
+    span overlaps a copy already kept for its key is the same collection read twice and
+    is dropped, on the raw and the sketch path alike; copies covering other windows are
+    combined. Returns (ent, perf, sketch) with one entity row per key; first / last /
+    samples are combined when present."""
+    codes, uniq = pd.factorize(keys)  # first occurrences keep their order
+    if len(uniq) == len(ent): return ent, perf, sketch
+    codes = codes.astype('int32')
+    keep = np.ones(len(ent), dtype=bool)
+    if drop_overlaps:
+        if 'first' in ent:
+            first, last = ent['first'].to_numpy(dtype='datetime64[ns]'), ent['last'].to_numpy(dtype='datetime64[ns]')
+        else:
+            span = perf['time'].groupby(perf['entity'].to_numpy()).agg(['min', 'max']).reindex(range(len(ent)))
+            first, last = span['min'].to_numpy(dtype='datetime64[ns]'), span['max'].to_numpy(dtype='datetime64[ns]')
+        kept = {}
+        for i in np.flatnonzero(pd.Series(codes).duplicated(keep=False).to_numpy()):
+            spans = kept.setdefault(codes[i], [])
+            if any(first[i] <= hi and lo <= last[i] for lo, hi in spans): keep[i] = False
+            else: spans.append((first[i], last[i]))
+    if perf is not None:
+        perf = perf[keep[perf['entity'].to_numpy()]]
+        perf = perf.assign(entity=codes[perf['entity'].to_numpy()]).reset_index(drop=True)
+    if sketch is not None:
+        sketch = sketch[keep[sketch['entity'].to_numpy()]]
+        sketch = sketch_merge([sketch.assign(entity=codes[sketch['entity'].to_numpy()])])
+    ent, codes = ent[keep], codes[keep]
+    out = ent.groupby(codes).first()
+    for col, how in (('first', 'min'), ('last', 'max'), ('samples', 'sum')):
+        if col in ent: out[col] = ent[col].groupby(codes).agg(how)
+    return out.reset_index(drop=True), perf, sketch
+
+def perf_tables(frames, sketch=False):
+    """Builds ('perf_ent', 'perf', 'perf_sketch') from [(scope, (entities, samples))]
+    pairs from read_perf_sheet, or from sketch_perf_sheet when sketch=True. An entity
+    whose samples are split over several tabs ("VM Performance", "VM Performance (2)")
+    is one entity, matched on scope and case-insensitive name. Only one of 'perf' (raw
+    samples) and 'perf_sketch' is set; all None without samples."""
+    ents, samples, n = [], [], 0
+    for scope, (ent, part) in frames:
+        if ent.empty: continue
+        ents.append(ent.assign(scope=scope)[['scope', *ent.columns]])
+        samples.append(part.assign(entity=part['entity'] + n))
+        n += len(ent)
+    if not samples: return None, None, None
+    ent, samples = pd.concat(ents, ignore_index=True), pd.concat(samples, ignore_index=True)
+    keys = ent['scope'] + "\0" + ent['name'].astype(str).str.lower()
+    if sketch:
+        ent, _, samples = fold_entities(ent, keys, sketch=samples)
+        return ent, None, samples
+    ent, samples, _ = fold_entities(ent, keys, perf=samples)
+    return ent, samples, None
+
+# --- QUANTILE SKETCHES ---
+# Low-memory mode keeps a log-bucket histogram per entity and metric instead of the raw
+# samples (the DDSketch scheme: every quantile within PERF_SKETCH_ALPHA relative error).
+# Sketches merge by adding counts, so a cluster scope or a multi-file merge never needs
+# the samples again. Stored long and sparse: entity, metric, bucket, count.
+PERF_METRICS = ('cpu_ghz', 'mem_gb')
+PERF_CHUNK_ROWS = 200_000
+PERF_SKETCH_ALPHA = 0.01
+PERF_SKETCH_GAMMA = (1 + PERF_SKETCH_ALPHA) / (1 - PERF_SKETCH_ALPHA)
+PERF_SKETCH_MIN = 1e-3  # GHz / GB; smaller values (idle, zero) share one bucket read back as 0
+SKETCH_ZERO = math.floor(math.log(PERF_SKETCH_MIN) / math.log(PERF_SKETCH_GAMMA)) - 1
+
+def sketch_buckets(values):
+    """Bucket index per value: ceil(log_gamma(v)), or SKETCH_ZERO below PERF_SKETCH_MIN."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        idx = np.ceil(np.log(values) / math.log(PERF_SKETCH_GAMMA))
+    return np.where(values >= PERF_SKETCH_MIN, idx, SKETCH_ZERO).astype('int16')
+
+def sketch_values(buckets):
+    """Representative value of each bucket (its relative-error midpoint)."""
+    return np.where(buckets == SKETCH_ZERO, 0.0, 2 * PERF_SKETCH_GAMMA ** buckets.astype('float64') / (PERF_SKETCH_GAMMA + 1))
+
+def sketch_samples(codes, cpu, mem):
+    """Sketch rows for one batch of samples (entity codes with their CPU and memory values)."""
+    parts = []
+    for m, vals in enumerate((cpu, mem)):
+        ok = ~np.isnan(vals)
+        parts.append(pd.DataFrame({'entity': codes[ok], 'metric': np.int8(m), 'bucket': sketch_buckets(vals[ok]), 'count': np.uint32(1)}))
+    return sketch_merge(parts)
+
+def sketch_merge(parts):
+    """Merges sketch frames: counts of the same (entity, metric, bucket) are added.
+    The result is sorted by entity, metric, bucket, as sketch_quantiles expects."""
+    sk = pd.concat(parts, ignore_index=True)
+    key = (sk['entity'].to_numpy(dtype='int64') << 24) | (sk['metric'].to_numpy(dtype='int64') << 16) | (sk['bucket'].to_numpy(dtype='int64') + 32768)
+    uniq, inv = np.unique(key, return_inverse=True)
+    return pd.DataFrame({
+        'entity': (uniq >> 24).astype('int32'), 'metric': ((uniq >> 16) & 0xFF).astype('int8'),
+        'bucket': ((uniq & 0xFFFF) - 32768).astype('int16'),
+        'count': np.bincount(inv, weights=sk['count'].to_numpy(dtype='float64')).astype('uint32'),
+    })
+
+def sketch_quantiles(sk, metric, n_groups, qs):
+    """Per-entity quantiles of one metric from sketch rows, as an (n_groups, len(qs))
+    array (NaN for entities without samples). Rank q*(n-1), like the raw path's lower end."""
+    rows = sk[sk['metric'] == PERF_METRICS.index(metric)]
+    codes, cnt = rows['entity'].to_numpy(), rows['count'].to_numpy(dtype='float64')
+    vals = sketch_values(rows['bucket'].to_numpy())
+    cum = np.cumsum(cnt)
+    tot = np.bincount(codes, weights=cnt, minlength=n_groups)
+    base = np.cumsum(tot) - tot
+    
+    out = np.full((n_groups, len(qs)), np.nan)
+    has = tot > 0
+    for j, q in enumerate(qs):
+        pos = np.searchsorted(cum, base[has] + np.floor(q * (tot[has] - 1)), side='right')
+        out[has, j] = vals[pos]
+    return out
+
+def group_percentiles(codes, values, n_groups, qs):
+    """Percentiles of `values` within each group code, for many groups in one sort.
+    Returns an (n_groups, len(qs)) array, interpolated linearly like np.percentile;
+    NaN samples are ignored and groups without samples are NaN."""
+    ok = ~np.isnan(values)
+    codes, values = codes[ok], values[ok]
+    # Sort by value, then stably by group (a radix sort on int codes): ~2x faster than lexsort
+    by_val = np.argsort(values)
+    v = values[by_val[np.argsort(codes[by_val], kind='stable')]].astype('float64')
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    
+    out = np.full((n_groups, len(qs)), np.nan)
+    has = counts > 0
+    last, first = counts[has] - 1, starts[has]
+    for j, q in enumerate(qs):
+        pos = last * q
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, last)
+        a, b = v[first + lo], v[first + hi]
+        out[has, j] = a + (b - a) * (pos - lo)
+    return out
+
+# --- COINCIDENT DEMAND ---
+# Peaks of different VMs rarely line up, so the sum of per-VM 95ths oversizes. Raw
+# samples are instead snapped to one time grid and summed per timestamp and cluster;
+# the percentile is then taken over the cluster (or scope) total. The grid step is the
+# typical sampling interval within an entity (Live Optics offsets each VM's samples by
+# a few seconds), and the grid never has more than PERF_MAX_SLOTS slots: longer
+# collections are averaged into coarser slots. The VM x time working set is built a
+# block of VMs at a time so it stays within PERF_GRID_BYTES.
+PERF_GRID_BYTES = 64 << 20
+PERF_MAX_SLOTS = 4096  # two weeks of 5-minute samples; bounds each (clusters x slots) series
+
+def time_grid(codes, times):
+    """(start, step) of the sampling grid for int64 ns times of the given entity codes.
+    step is the median of the entities' median sampling intervals, widened by a whole
+    factor if the span would need more than PERF_MAX_SLOTS slots."""
+    start, span = times.min(), times.max() - times.min()
+    by_time = np.argsort(times, kind='stable')
+    order = by_time[np.argsort(codes[by_time], kind='stable')]
+    c, t = codes[order], times[order]
+    gaps = np.diff(t)
+    ok = (c[1:] == c[:-1]) & (gaps > 0)
+    step = int(pd.Series(gaps[ok]).groupby(c[1:][ok]).median().median()) if ok.any() else 1
+    if span > step * (PERF_MAX_SLOTS - 1):
+        step *= math.ceil(span / (step * (PERF_MAX_SLOTS - 1)))
+    return start, max(step, 1)
+
+def coincident_series(codes, slots, values, groups, n_groups, n_slots):
+    """Per-group totals at each grid slot: an (n_groups, n_slots) float64 array.
+    Each entity's samples are averaged per slot, gaps between its first and last sample
+    filled from the nearest earlier sample, and the entity added to its group's row. An
+    entity adds nothing before its first or after its last sample (a VM that exists for
+    part of the collection is not counted across the whole window)."""
+    out = np.zeros((n_groups, n_slots))
+    ok = ~np.isnan(values)
+    codes, slots, values = codes[ok], slots[ok], values[ok].astype('float64')
+    ents = np.unique(codes)
+    block = max(1, PERF_GRID_BYTES // (8 * 8 * n_slots))  # up to 8 block-sized 8-byte arrays are live at once
+    by_ent = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[by_ent], ents)
+    cols = np.arange(n_slots)
+    for b in range(0, len(ents), block):
+        ids = ents[b:b + block]
+        lo, hi = bounds[b], bounds[b + block] if b + block < len(ents) else len(by_ent)
+        rows = by_ent[lo:hi]
+        local = np.searchsorted(ids, codes[rows]) * n_slots + slots[rows]
+        tot = np.bincount(local, weights=values[rows], minlength=len(ids) * n_slots).reshape(len(ids), n_slots)
+        cnt = np.bincount(local, minlength=len(ids) * n_slots).reshape(len(ids), n_slots)
+        seen = cnt > 0
+        mat = np.divide(tot, cnt, out=np.zeros_like(tot), where=seen)
+        # forward fill interior gaps only; slots outside [first, last] sample stay 0
+        prev = np.maximum.accumulate(np.where(seen, cols, -1), axis=1)
+        inside = (prev >= 0) & (cols <= prev[:, -1:])
+        mat = np.where(inside, np.take_along_axis(mat, np.maximum(prev, 0), axis=1), 0.0)
+        np.add.at(out, groups[ids], mat)
+    return out
+
+def perf_partials(ent, perf=None, sketch=None, groups=None, n_groups=1):
+    """Everything the demand metrics need, computed once over all samples: per-entity
+    P95/P99/peak, sample counts and time span, and per-cluster coincident series
+    (`groups` is each entity's cluster code) for the VM and host bases. Raw samples
+    share one time grid; sketches carry no timeline and give no series."""
+    n = len(ent)
+    groups = np.zeros(n, dtype='int64') if groups is None else groups
+    qs = list(PERF_QUANTILES.values())
+    is_vm = (ent['scope'] == 'vm').to_numpy()
+    series = {}
+    
+    if sketch is not None:
+        sampled = np.bincount(sketch['entity'].to_numpy(), minlength=n) > 0
+        pct = {m: sketch_quantiles(sketch, m, n, qs) for m in PERF_METRICS}
+        samples = ent['samples'].to_numpy()
+        first, last = ent['first'].to_numpy(), ent['last'].to_numpy()
+    else:
+        codes = perf['entity'].to_numpy()
+        samples = np.bincount(codes, minlength=n)
+        sampled = samples > 0
+        times = perf['time'].to_numpy().astype('int64')
+        span = pd.Series(times).groupby(codes).agg(['min', 'max']).reindex(range(n))
+        first, last = span['min'].to_numpy().astype('datetime64[ns]'), span['max'].to_numpy().astype('datetime64[ns]')
+        pct = {m: group_percentiles(codes, perf[m].to_numpy(), n, qs) for m in PERF_METRICS}
+        if len(codes):
+            t0, step = time_grid(codes, times)
+            slots = np.rint((times - t0) / step).astype('int64')
+            for basis, rows in (('vm', is_vm[codes]), ('host', ~is_vm[codes])):
+                if rows.any():
+                    series[basis] = {m: coincident_series(codes[rows], slots[rows], perf[m].to_numpy()[rows], groups, n_groups, int(slots.max()) + 1)
+                                     for m in PERF_METRICS}
+    return {'groups': groups, 'is_vm': is_vm, 'sampled': sampled, 'samples': samples,
+            'first': first, 'last': last, 'pct': pct, 'series': series}
+
+def combine_perf(pp, group_mask, group_names):
+    """Demand metrics for the clusters selected in group_mask, from perf_partials. VM
+    samples are used when the selection has any, else host samples. perf_stats holds
+    P95/P99/peak; perf_ghz_demand / perf_mem_demand the P95 (lo_basis). Raw samples give
+    coincident figures (percentiles of the per-timestamp total, see coincident_series)
+    and per-cluster P95s in perf_clusters; sketches give the sum of per-entity
+    percentiles (an upper bound). Empty when the selection has no samples."""
+    live = pp['sampled'] & group_mask[pp['groups']]
+    if not live.any(): return {}
+    basis = 'vm' if (live & pp['is_vm']).any() else 'host'
+    present = live & (pp['is_vm'] if basis == 'vm' else ~pp['is_vm'])
+    
+    per_entity = {m: dict(zip(PERF_QUANTILES, np.nansum(p[present], axis=0).tolist())) for m, p in pp['pct'].items()}
+    stats, clusters = per_entity, {}
+    series = pp['series'].get(basis)
+    if series:
+        qs = [q * 100 for q in PERF_QUANTILES.values()]
+        stats = {m: dict(zip(PERF_QUANTILES, np.percentile(s[group_mask].sum(axis=0), qs).tolist())) for m, s in series.items()}
+        for m, s in series.items():
+            used = group_mask & s.any(axis=1)
+            clusters[m] = dict(zip(group_names[used], np.percentile(s[used], 95, axis=1).tolist()))
+    return {
+        'has_perf': True, 'perf_basis': basis, 'perf_entities': int(present.sum()), 'perf_samples': int(pp['samples'][present].sum()),
+        'perf_start': pd.Timestamp(pp['first'][present].min()), 'perf_end': pd.Timestamp(pp['last'][present].max()),
+        'perf_coincident': bool(series), 'perf_ghz_demand': stats['cpu_ghz']['p95'], 'perf_mem_demand': stats['mem_gb']['p95'],
+        'perf_stats': stats, 'perf_stats_sum': per_entity,
+        'perf_clusters': pd.DataFrame({'cpu_ghz': clusters.get('cpu_ghz', {}), 'mem_gb': clusters.get('mem_gb', {})}),
+    }
+
+# --- RVTOOLS CSV BUNDLES ---
+# RVTools can export every tab as RVTools_tab<Tab>.csv; a folder or zip of those is
+# read with the C CSV parser instead of the XLSX reader (only mapped columns when streaming).
+CSV_TAB_RE = re.compile(r'tab(v\w+)\.csv$', re.IGNORECASE)
+CSV_TABLES = {'vInfo': 'vm', 'vHost': 'h', 'vDatastore': 'ds'}
+
+def csv_bundle_tabs(names):
+    """{tab: member name} for the RVTools tabs present in a list of file names."""
+    wanted = {t.lower(): t for t in CSV_TABLES}
+    tabs = {}
+    for n in names:
+        m = CSV_TAB_RE.search(n.replace("\\", "/").rsplit("/", 1)[-1])
+        if m and m.group(1).lower() in wanted:
+            tabs.setdefault(wanted[m.group(1).lower()], n)
+    return tabs
+
+def open_csv_bundle(file):
+    """(tabs, opener, zip or None) if file is a directory or zip holding RVTools tab CSVs,
+    else None. opener(member) returns a binary file handle."""
+    if isinstance(file, (str, os.PathLike)) and os.path.isdir(file):
+        tabs = csv_bundle_tabs(os.listdir(file))
+        return (tabs, lambda n: open(os.path.join(file, n), 'rb'), None) if tabs else None
+    
+    try:
+        if not zipfile.is_zipfile(file): return None
+        zf = zipfile.ZipFile(file)
+    finally:
+        if hasattr(file, 'seek'): file.seek(0)
+    tabs = csv_bundle_tabs(zf.namelist())
+    if not tabs:
+        zf.close()
+        return None
+    return tabs, zf.open, zf
+
+def read_csv_tab(opener, member, tab, streaming=False):
+    """One tab CSV with its header promoted. Every column is parsed, as for a workbook;
+    with streaming only the columns stream_columns picks. Semicolon-separated files
+    (comma-decimal locales) are read with decimal=','. The header is found by CSV
+    record, so quoted multi-line cells above it do not shift the data."""
+    def open_text(fh):
+        return io.TextIOWrapper(fh, encoding='utf-8-sig', errors='replace', newline='')
+    
+    with opener(member) as fh:
+        sample = list(itertools.islice(open_text(fh), HEADER_SCAN_ROWS))
+    sep = ';' if sum(l.count(';') for l in sample) > sum(l.count(',') for l in sample) else ','
+    with opener(member) as fh:
+        reader = csv.reader(open_text(fh), delimiter=sep)
+        head, ends = [], []  # records, and the physical line each one ends on
+        for rec in itertools.islice(reader, HEADER_SCAN_ROWS):
+            head.append(rec)
+            ends.append(reader.line_num)
+    if not head: return pd.DataFrame()
+    
+    hdr = find_header_row(head, HEADER_KWS[tab])
+    header = [v.strip() for v in head[hdr]]
+    keep = stream_columns(header, CSV_TABLES[tab]) if streaming else [(j, name, False) for j, name in enumerate(header)]
+    if not keep: return pd.DataFrame(index=pd.RangeIndex(0))
+    with opener(member) as fh:
+        text = open_text(fh)
+        for _ in range(ends[hdr]): text.readline()
+        try:
+            df = pd.read_csv(text, sep=sep, header=None, usecols=[j for j, _, _ in keep],
+                             decimal=',' if sep == ';' else '.', low_memory=False)
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame(columns=[j for j, _, _ in keep])
+    return df.rename(columns={j: name for j, name, _ in keep})
+
+def load_csv_bundle(file, streaming=False):
+    """(src_type, df_map) for an RVTools CSV bundle, or None if file is not one."""
+    bundle = open_csv_bundle(file)
+    if bundle is None: return None
+    tabs, opener, zf = bundle
+    try:
+        if 'vInfo' not in tabs: return "Unknown", {}
+        frames = {CSV_TABLES[t]: read_csv_tab(opener, m, t, streaming) for t, m in tabs.items()}
+    finally:
+        if zf is not None: zf.close()
+    return "RVTools", {"vm": frames["vm"], "h": frames.get("h", pd.DataFrame()),
+                       "ds": frames.get("ds", pd.DataFrame()), "d": pd.DataFrame()}
+
+def load_tables(file, streaming=False):
+    """Loads a workbook (or RVTools CSV bundle) and promotes headers.
+    Returns (src_type, {"vm", "h", "ds", "d"} frames)."""
+    bundle = load_csv_bundle(file, streaming)
+    if bundle is not None: return bundle
+    
+    src_type, sheets = read_source_sheets(file, streaming)
+    df_vm = df_h = df_ds = df_d = None
+    vm_tab = SOURCE_SHEETS.get(src_type, [None])[0]
+    if vm_tab in sheets:
+        df_vm = sheets[vm_tab] if streaming else promote_header(sheets[vm_tab], HEADER_KWS[vm_tab])
+    
+    if src_type == "RVTools":
+        df_h = promote_header(sheets.get('vHost', pd.DataFrame()), HEADER_KWS['vHost'])
+        df_ds = promote_header(sheets.get('vDatastore', pd.DataFrame()), HEADER_KWS['vDatastore'])
+        df_d = pd.DataFrame()
+        
+    elif src_type == "LiveOptics":
+        df_h = promote_header(sheets.get('ESX Hosts', pd.DataFrame()), HEADER_KWS['ESX Hosts'])
+        df_ds = promote_header(sheets.get('Host Devices', pd.DataFrame()), HEADER_KWS['Host Devices'])
+        disk_tab = find_disk_tab(sheets)
+        if disk_tab: df_d = promote_header(sheets[disk_tab], HEADER_KWS['disks'])
+        perf_ent, perf, perf_sketch = perf_tables(sheets.get('perf', []), sketch=streaming)
+        return src_type, {"vm": df_vm, "h": df_h, "ds": df_ds, "d": df_d, "perf_ent": perf_ent, "perf": perf, "perf_sketch": perf_sketch}
+        
+    return src_type, {"vm": df_vm, "h": df_h, "ds": df_ds, "d": df_d}
+
+# --- TABLE CACHE ---
+# Parsed tables are kept on disk as uncompressed Arrow IPC (feather) files so a re-opened
+# export is memory-mapped instead of re-parsing the XML. Bump PARSER_VERSION whenever a
+# change to the loaders alters what load_tables returns.
+# Entries hold customer inventory: each write prunes entries of other parser versions,
+# entries unused for CACHE_MAX_AGE_DAYS, then least-recently-used ones above CACHE_MAX_BYTES.
+PARSER_VERSION = 5
+TABLE_KEYS = ("vm", "h", "ds", "d", "perf_ent", "perf", "perf_sketch")
+CACHE_MAX_BYTES = 2 << 30
+CACHE_MAX_AGE_DAYS = 30
+CACHE_ENTRY_RE = re.compile(r'^[0-9a-f]+-v(\d+)(?:-stream)?$')
+
+def default_cache_dir():
+    """SIZING_CACHE_DIR if set (empty disables caching), else ~/.cache/host-sizing."""
+    env = os.environ.get("SIZING_CACHE_DIR")
+    if env is not None: return env or None
+    return os.path.join(os.path.expanduser("~"), ".cache", "host-sizing")
+
+def cache_policy(cache_dir):
+    """One-line notice of where parsed tables persist and for how long (CLI help, app)."""
+    return (f"Parsed tables (customer inventory) are cached in {cache_dir}; entries unused for "
+            f"{CACHE_MAX_AGE_DAYS} days or beyond {CACHE_MAX_BYTES >> 30} GB are pruned. Set SIZING_CACHE_DIR= (empty) to disable.")
+
+def _arrow_safe(df):
+    """Column-pruned copy Arrow can store: unnamed all-empty and repeated headers are
+    dropped (the pipeline only ever reads the first), and object columns mixing numbers
+    with text ("1,024") are stored as text, which parse_float reads back the same."""
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.loc[:, [c != "" or df[c].notna().any() for c in df.columns]]
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        if col.dtype == object and col.dropna().map(type).nunique() > 1:
+            col = col.where(col.isna(), col.astype(str))
+        out[c] = col
+    return pd.DataFrame(out, index=pd.RangeIndex(len(df)))
+
+def cache_path(cache_dir, file_hash, streaming=False):
+    return os.path.join(cache_dir, f"{file_hash}-v{PARSER_VERSION}{'-stream' if streaming else ''}")
+
+def read_table_cache(path):
+    """(src_type, df_map) from a cache entry, or None if it is missing or unreadable."""
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("parser_version") != PARSER_VERSION: return None
+        df_map = {}
+        for t in TABLE_KEYS:
+            kind = meta["tables"][t]
+            if kind == "none": df_map[t] = None
+            elif kind == "empty": df_map[t] = pd.DataFrame()
+            else: df_map[t] = feather.read_table(os.path.join(path, f"{t}.arrow"), memory_map=True).to_pandas()
+        return meta["src_type"], df_map
+    except (OSError, ValueError, KeyError, *ARROW_ERRORS):
+        return None
+
+def _entry_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+def prune_table_cache(cache_dir, keep=None, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+    """Deletes cache entries of other parser versions, entries (and abandoned temp dirs)
+    unused for max_age_days, then the least recently used until the rest fit max_bytes.
+    An entry's last use is its directory mtime, refreshed on every hit. `keep` (the entry
+    just written) is never removed. Returns the number of entries deleted."""
+    try:
+        found = list(os.scandir(cache_dir))
+    except OSError:
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    drop, live = [], []
+    for e in found:
+        if not e.is_dir(follow_symlinks=False) or e.path == keep: continue
+        m = CACHE_ENTRY_RE.match(e.name)
+        try:
+            used = e.stat().st_mtime
+        except OSError:
+            continue
+        if m is None:
+            if e.name.startswith(".tmp-") and used < cutoff: drop.append(e.path)
+        elif int(m.group(1)) != PARSER_VERSION or used < cutoff:
+            drop.append(e.path)
+        else:
+            live.append((used, e.path))
+    
+    total = _entry_size(keep) if keep and os.path.isdir(keep) else 0
+    for used, path in sorted(live, reverse=True):
+        total += _entry_size(path)
+        if total > max_bytes: drop.append(path)
+    for path in drop:
+        shutil.rmtree(path, ignore_errors=True)
+    return len(drop)
+
+def write_table_cache(path, src_type, df_map):
+    """Writes an entry (tables already passed through _arrow_safe) into a temp dir and renames it into place, so concurrent readers
+    (batch workers, several app sessions) never see a half-written entry."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        meta = {"src_type": src_type, "parser_version": PARSER_VERSION, "tables": {}}
+        for t in TABLE_KEYS:
+            df = df_map.get(t)
+            if df is None: kind = "none"
+            elif df.shape[1] == 0: kind = "empty"
+            else:
+                df.to_feather(os.path.join(tmp, f"{t}.arrow"), compression="uncompressed")
+                kind = "file"
+            meta["tables"][t] = kind
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # another process won the race, or the cache dir is not writable
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    prune_table_cache(os.path.dirname(path), keep=path)
+
+def load_tables_cached(file, streaming=False, cache_dir=None, file_hash=None):
+    """load_tables through the on-disk cache. cache_dir=None (or no pyarrow) skips the cache."""
+    if not cache_dir or not HAS_ARROW: return load_tables(file, streaming)
+    path = cache_path(cache_dir, file_hash or file_digest(file), streaming)
+    hit = read_table_cache(path)
+    if hit:
+        try:
+            os.utime(path)  # marks the entry as recently used for prune_table_cache
+        except OSError:
+            pass
+        return hit
+    shutil.rmtree(path, ignore_errors=True)  # an unreadable entry would block the rewrite
+    
+    src_type, df_map = load_tables(file, streaming)
+    if src_type != "Unknown":
+        # Serve the same pruned tables a later cache hit would return
+        df_map = {t: _arrow_safe(df) if df is not None and df.shape[1] else df for t, df in df_map.items()}
+        try:
+            write_table_cache(path, src_type, df_map)
+        except (ValueError, TypeError, ImportError, *ARROW_ERRORS):
+            pass  # a column Arrow cannot store: serve this run uncached
+    return src_type, df_map
+
+# --- MULTI-FILE CONSOLIDATION ---
+# Merged exports tag every row with its vCenter; cluster labels are prefixed with it so
+# same-named clusters from different vCenters stay distinct.
+VCENTER_COL = "Source vCenter"
+VCENTER_KWS = ['VI SDK Server', 'vCenter', 'vCenter Server']
+DEDUP_KWS = {
+    "vm": ['VM UUID', 'VM Instance UUID', 'Instance UUID', 'UUID'],
+    "h": ['Host Name', 'Host', 'vHostName', 'Server'],
+    "ds": ['Device Name', 'Name', 'vDatastoreName'],
+}
+
+def load_many(files, max_workers=None, streaming=False, cache_dir=None):
+    """load_tables_cached over several files in a process pool. Files must be paths or
+    picklable file objects (e.g. io.BytesIO); results keep the input order."""
+    load = functools.partial(load_tables_cached, streaming=streaming, cache_dir=cache_dir)
+    if len(files) == 1: return [load(files[0])]
+    with ProcessPoolExecutor(max_workers=min(len(files), max_workers or os.cpu_count() or 1)) as pool:
+        return list(pool.map(load, files))
+
+def export_vcenter(df_map, fallback):
+    """vCenter an export was taken from (RVTools 'VI SDK Server'), else the fallback label."""
+    for df in (df_map.get("vm"), df_map.get("h")):
+        col = get_col(df, VCENTER_KWS)
+        if col:
+            vals = df[col].dropna().astype(str).str.strip()
+            vals = vals[vals != ""]
+            if not vals.empty: return vals.iloc[0]
+    return fallback
+
+def _dedupe(df, t):
+    """Drops repeated rows of one object within a vCenter (UUID for VMs, falling back to name)."""
+    key_col = get_col(df, DEDUP_KWS[t])
+    if t == "vm":
+        name_col = get_col(df, REQ_MAPS['vm_name']['kws'])
+        key = df[key_col] if key_col else pd.Series(pd.NA, index=df.index)
+        if name_col: key = key.fillna(df[name_col])
+    elif key_col:
+        key = df[key_col]
+    else:
+        return df
+    dup = pd.DataFrame({'vc': df[VCENTER_COL], 'key': key.astype(str).str.strip().str.lower()}).duplicated() & key.notna()
+    return df[~dup.values]
+
+def merge_exports(loaded, names):
+    """Unions several loaded exports (list of (src_type, df_map)) of the same source type
+    into one df_map for a single consolidated sizing. Returns (src_type, df_map, info)."""
+    types = {src for src, _ in loaded}
+    if "Unknown" in types: raise ValueError("Unrecognized export format in merge set.")
+    if len(types) > 1: raise ValueError("Consolidation needs exports of one type (all RVTools or all Live Optics).")
+    
+    parts = {"vm": [], "h": [], "ds": [], "d": []}
+    vcenters = []
+    for (src_type, df_map), name in zip(loaded, names):
+        vc = export_vcenter(df_map, os.path.splitext(os.path.basename(str(name)))[0])
+        vcenters.append(vc)
+        for t in parts:
+            df = df_map.get(t)
+            if df is not None and not df.empty:
+                parts[t].append(df.assign(**{VCENTER_COL: vc}))
+    
+    merged, info = {}, {'files': len(loaded), 'vcenters': sorted(set(vcenters)), 'duplicates': {}}
+    merged['perf_ent'], merged['perf'], merged['perf_sketch'] = merge_perf([df_map for _, df_map in loaded], vcenters)
+    for t, frames in parts.items():
+        if not frames:
+            merged[t] = pd.DataFrame()
+            continue
+        df = pd.concat(frames, ignore_index=True)
+        if t in DEDUP_KWS:
+            before = len(df)
+            df = _dedupe(df, t).reset_index(drop=True)
+            info['duplicates'][t] = before - len(df)
+        merged[t] = df
+    return types.pop(), merged, info
+
+def merge_perf(df_maps, vcenters):
+    """Concatenates the performance tables of several exports, re-basing entity codes.
+    An entity repeated within one vCenter becomes one (see fold_entities): a copy
+    overlapping one already kept is dropped, copies from other time windows are combined,
+    so raw samples and sketches give the same demand."""
+    ents, samples, sketches, n = [], [], [], 0
+    for df_map, vc in zip(df_maps, vcenters):
+        ent = df_map.get("perf_ent")
+        if ent is None or ent.empty: continue
+        ents.append(ent.assign(**{VCENTER_COL: vc}))
+        for key, out in (("perf", samples), ("perf_sketch", sketches)):
+            df = df_map.get(key)
+            if df is not None: out.append(df.assign(entity=df['entity'] + n))
+        n += len(ent)
+    if not ents: return None, None, None
+    ent = pd.concat(ents, ignore_index=True)
+    perf = pd.concat(samples, ignore_index=True) if samples else None
+    sketch = pd.concat(sketches, ignore_index=True) if sketches else None
+    
+    keys = ent[VCENTER_COL].astype(str) + "\0" + ent['scope'] + "\0" + ent['name'].astype(str).str.lower()
+    return fold_entities(ent, keys, perf, sketch, drop_overlaps=True)
+
+def cluster_labels(df, col):
+    """Per-row cluster label: NaN -> 'Unclustered', prefixed with the vCenter in merged exports."""
+    labels = df[col].fillna("Unclustered").astype(str)
+    if VCENTER_COL in df.columns:
+        labels = df[VCENTER_COL].astype(str) + " / " + labels
+    return labels
+
+# --- MAPPING CONFIGURATION ---
+REQ_MAPS = {
+    "vm_name": {"df": "vm", "kws": ['VM Name', 'VM', 'vInfoName', 'Name']},
+    "vm_cluster": {"df": "vm", "kws": ['Cluster', 'vInfoCluster']},
+    "vm_datacenter": {"df": "vm", "kws": ['Datacenter', 'Data Center', 'vInfoDataCenter']},
+    "vm_power": {"df": "vm", "kws": ['Power State', 'Powerstate']},
+    "vm_cpu": {"df": "vm", "kws": ['Virtual CPU', 'CPUs', 'vInfoCPUs'], "type": "count"},
+    "vm_ram": {"df": "vm", "kws": ['Provisioned Memory', 'Memory', 'vInfoMemory'], "type": "gb"},
+    "vm_prov": {"df": "vm", "kws": ['Virtual Disk Size', 'Provisioned', 'vInfoProvisioned'], "type": "gb"},
+    "vm_used": {"df": "vm", "kws": ['Virtual Disk Used', 'In Use', 'vInfoInUse'], "type": "gb"},
+    
+    "h_name": {"df": "h", "kws": ['Host Name', 'Host', 'vHostName', 'Server']},
+    "h_cluster": {"df": "h", "kws": ['Cluster', 'vHostCluster']},
+    "h_cpu": {"df": "h", "kws": ['CPU Sockets', '# CPU', 'vHostNumCPU', 'Socket'], "type": "count"},
+    "h_core": {"df": "h", "kws": ['CPU Cores', 'Cores per CPU', 'vHostCoresPerCPU', 'Cores'], "type": "count"},
+    "h_ram": {"df": "h", "kws": ['Memory', '# Memory', 'vHostMemory'], "type": "gb"},
+    
+    "ds_name": {"df": "ds", "kws": ['Device Name', 'Name', 'vDatastoreName']},
+    "ds_cap": {"df": "ds", "kws": ['Capacity', 'vDatastoreCapacity'], "type": "gb"},
+    "ds_used": {"df": "ds", "kws": ['Used Capacity', 'Used', 'In Use', 'vDatastoreInUse'], "type": "gb"},
+    "ds_free": {"df": "ds", "kws": ['Free Capacity', 'Free', 'vDatastoreFreeSpace'], "type": "gb"},
+    "ds_hosts": {"df": "ds", "kws": ['Server', 'Host', 'Hosts', 'vDatastoreHosts']},
+    "ds_type": {"df": "ds", "kws": ['Device Type', 'Type', 'vDatastoreType']},
+    
+    "d_host": {"df": "d", "kws": ['Server', 'Host']},
+    "d_model": {"df": "d", "kws": ['Model', 'Disk Model']},
+    "d_cap": {"df": "d", "kws": ['Capacity', 'Disk Capacity'], "type": "gb"}
+}
+
+def auto_map_scored(df_map):
+    """Default column mapping with confidence: {key: (column or "Not Found", score)}.
+    One ColumnIndex per table serves all REQ_MAPS entries."""
+    indexes = {t: column_index(tuple(df.columns)) for t, df in df_map.items() if df is not None and not df.empty}
+    scored = {}
+    for key, conf in REQ_MAPS.items():
+        col, score = indexes[conf["df"]].match(conf["kws"]) if conf["df"] in indexes else (None, 0.0)
+        scored[key] = (col or "Not Found", score)
+    return scored
+
+def auto_map(df_map):
+    """Default column mapping: the column get_col picks for each REQ_MAPS entry."""
+    return {key: col for key, (col, _) in auto_map_scored(df_map).items()}
+
+# --- PROCESSORS ---
+# Pipeline: parse -> normalize (per mapping) -> filter (per cluster scope) -> aggregate -> size (per hardware).
+class HostClusterResolver:
+    """Resolves host references (FQDN, short name or name prefix) to clusters.
+
+    Built once per host table and shared by datastore and disk mapping. Lookup order is
+    exact FQDN, then short name, then prefix (kept for exports that truncate names).
+    Names that match hosts in more than one cluster are recorded in `ambiguous`; the
+    first host in table order wins, as before.
+    """
+
+    def __init__(self, host_to_cluster):
+        self.exact = {}
+        self.order = {}
+        self.short = {}
+        for i, (h, c) in enumerate(host_to_cluster.items()):
+            if pd.isna(h): continue
+            key = str(h).strip().lower()
+            if not key or key in self.exact: continue
+            self.exact[key] = c
+            self.order[key] = i
+            self.short.setdefault(key.split('.')[0], []).append(key)
+        self.sorted_keys = sorted(self.exact)
+        self.ambiguous = {}
+        self._memo = {}
+
+    def __bool__(self):
+        return bool(self.exact)
+
+    def _pick(self, name, keys):
+        clusters = {self.exact[k] for k in keys}
+        if len(clusters) > 1: self.ambiguous[name] = sorted(clusters)
+        return self.exact[min(keys, key=self.order.get)]
+
+    def resolve(self, host):
+        """Cluster for one host reference, or None."""
+        if pd.isna(host): return None
+        h = str(host).strip().lower()
+        if h in self._memo: return self._memo[h]
+        
+        c = self.exact.get(h)
+        if c is None and h:
+            h_short = h.split('.')[0]
+            if h_short in self.short:
+                c = self._pick(h_short, self.short[h_short])
+            elif h_short:
+                lo = bisect.bisect_left(self.sorted_keys, h_short)
+                hi = bisect.bisect_left(self.sorted_keys, h_short + '\uffff', lo)
+                if hi > lo: c = self._pick(h_short, self.sorted_keys[lo:hi])
+        self._memo[h] = c
+        return c
+
+    def resolve_list(self, hosts_str):
+        """Cluster of the first resolvable host in a comma-separated list."""
+        if pd.isna(hosts_str): return "Unclustered"
+        for h in str(hosts_str).split(','):
+            c = self.resolve(h)
+            if c is not None: return c
+        return "Unclustered"
+
+    def resolve_one(self, host):
+        c = self.resolve(host)
+        return "Unclustered" if c is None else c
+
+def normalize_tables(df_map, maps):
+    """Builds the typed column store for one mapping: one frame per table with columns
+    named by REQ_MAPS key, numeric fields as float64 (capacities already in GB, NaN where
+    a cell could not be parsed), plus the helper columns the filter stage needs:
+    'ClusterMap' (where a cluster can be resolved) and 'PoweredOn' on VMs, and the
+    VM's 'vCenter' where the export names it (used to group clusters)."""
+    cols = {"vm": {}, "h": {}, "ds": {}, "d": {}}
+    for key, col in maps.items():
+        conf = REQ_MAPS[key]
+        df = df_map.get(conf["df"])
+        if col == "Not Found" or df is None or col not in df.columns: continue
+        src = df[col]
+        if isinstance(src, pd.DataFrame): src = src.iloc[:, 0]  # duplicate header names
+        kind = conf.get("type")
+        if kind == "gb": src = parse_float(src) * unit_factor_gb(col)
+        elif kind == "count": src = parse_float(src)
+        cols[conf["df"]][key] = src
+    
+    tables = {}
+    for t in ("vm", "h", "ds", "d"):
+        df = df_map.get(t)
+        tables[t] = None if df is None or df.empty else pd.DataFrame(cols[t], index=df.index)
+    df_vm, df_h, df_ds, df_d = tables["vm"], tables["h"], tables["ds"], tables["d"]
+    
+    if df_vm is not None:
+        if 'vm_cluster' in df_vm:
+            df_vm['ClusterMap'] = cluster_labels(df_map['vm'], maps['vm_cluster'])
+        if 'vm_power' in df_vm:
+            df_vm['PoweredOn'] = df_vm['vm_power'].astype(str).str.contains('poweredOn', case=False, na=False)
+        vc_col = VCENTER_COL if VCENTER_COL in df_map['vm'].columns else get_col(df_map['vm'], VCENTER_KWS)
+        if vc_col:
+            df_vm['vCenter'] = df_map['vm'][vc_col]
+
+    # Datastore/disk -> cluster via their host lists, resolved within each vCenter
+    ambiguous = {}
+    if df_h is not None and 'h_cluster' in df_h:
+        df_h['ClusterMap'] = cluster_labels(df_map['h'], maps['h_cluster'])
+        if 'h_name' in df_h and not df_h.empty:
+            def scope(t):
+                src = df_map[t]
+                return src[VCENTER_COL] if VCENTER_COL in src.columns else pd.Series("", index=src.index)
+                
+            targets = [(df, col, t) for df, col, t in ((df_ds, 'ds_hosts', 'ds'), (df_d, 'd_host', 'd')) if df is not None and col in df]
+            for df, _, _ in targets: df['ClusterMap'] = "Unclustered"
+            for vc, hosts in df_h.groupby(scope('h'), sort=False):
+                resolver = HostClusterResolver(dict(zip(hosts['h_name'], hosts['ClusterMap'])))
+                for df, col, t in targets:
+                    rows = scope(t) == vc
+                    if rows.any():
+                        df.loc[rows, 'ClusterMap'] = df.loc[rows, col].map(resolver.resolve_list if t == 'ds' else resolver.resolve_one)
+                ambiguous.update(resolver.ambiguous)
+    tables['ambiguous_hosts'] = ambiguous
+
+    # Performance entities take the cluster of the VM / host of the same name
+    ent = df_map.get("perf_ent")
+    if ent is not None and not ent.empty and any(df is not None and 'ClusterMap' in df for df in (df_vm, df_h)):
+        clusters = pd.Series("Unclustered", index=ent.index, dtype=object)
+        for scope, df, name_col, t in (('vm', df_vm, 'vm_name', 'vm'), ('host', df_h, 'h_name', 'h')):
+            if df is None or name_col not in df or 'ClusterMap' not in df: continue
+            lookup = pd.Series(df['ClusterMap'].to_numpy(), index=perf_keys(df_map[t], df[name_col]).to_numpy())
+            lookup = lookup[~lookup.index.duplicated()]
+            rows = (ent['scope'] == scope).to_numpy()
+            clusters[rows] = perf_keys(ent[rows], ent.loc[rows, 'name']).map(lookup).fillna("Unclustered").to_numpy()
+        ent = ent.assign(ClusterMap=clusters)
+    tables['perf_ent'], tables['perf'], tables['perf_sketch'] = ent, df_map.get("perf"), df_map.get("perf_sketch")
+            
+    return tables
+
+def perf_keys(df, names):
+    """Name join key between performance entities and the VM / host tables (per vCenter when merged)."""
+    keys = names.astype(str).str.strip().str.lower()
+    if VCENTER_COL in df.columns: keys = df[VCENTER_COL].astype(str) + "/" + keys
+    return keys
+
+def filter_tables(tables, selected_clusters, include_off):
+    """Applies the cluster scope and power-state filter to normalized tables."""
+    scoped = bool(selected_clusters) and "All Clusters" not in selected_clusters
+    out = dict(tables)
+    for t in ("vm", "h", "ds", "d"):
+        df = tables[t]
+        if df is not None:
+            if scoped and 'ClusterMap' in df.columns:
+                df = df[df['ClusterMap'].isin(selected_clusters)]
+            if not include_off and 'PoweredOn' in df.columns:
+                df = df[df['PoweredOn']]
+        out[t] = df
+    
+    # Samples and sketches are scoped through their entity; the entity table stays whole so codes index it
+    ent = tables.get("perf_ent")
+    if scoped and ent is not None and 'ClusterMap' in ent.columns:
+        keep = ent['ClusterMap'].isin(selected_clusters).to_numpy()
+        for t in ("perf", "perf_sketch"):
+            df = tables.get(t)
+            if df is not None: out[t] = df[keep[df['entity'].to_numpy()]]
+    return out
+
+# --- CLUSTER SUMMARY ---
+# Workload totals are summed once per cluster (and VM power state) for a mapping; any
+# cluster scope then resolves by adding a handful of rows instead of re-filtering and
+# re-summing the tables. Rows of a table without a cluster column count in every scope,
+# as in filter_tables; they are kept under the ALL_ROWS key.
+ALL_ROWS = "\0all"
+LOGICAL_DISK_KWS = 'BOSS|USB|SD|RAID|PERC|Virtual|DVD|CD-ROM|DELL Disk|Cisco Disk'
+
+@dataclass
+class ClusterSummary:
+    """Per-cluster partial aggregates of one set of normalized tables. Partial frames are
+    indexed by cluster code (position in `labels`); combine() turns a cluster scope into
+    the metrics dict used by sizing and the report."""
+    source_type: str
+    labels: pd.Index        # cluster keys, ALL_ROWS last
+    cols: frozenset         # REQ_MAPS keys present in the tables
+    vm: pd.DataFrame        # per (cluster, on): n, vcpu, ram, prov, used and largest-VM trackers
+    h: pd.DataFrame         # per cluster: n, ram, cores, lic_cores
+    ds: pd.DataFrame        # per cluster: n, vsan_n, vsan_cap, san_cap, san_free, san_used
+    d: pd.DataFrame         # per (cluster, model): tib, n of the disks kept for vSAN detection
+    vm_sizes: dict          # per-VM name/vcpu/ram_gb, with 'cluster' and 'on', for the NUMA fit
+    groups: pd.DataFrame    # per cluster: vCenter / Datacenter of its VMs, where known
+    lic_skipped: tuple      # (labels, cluster codes) of hosts without readable sockets/cores
+    perf: dict = None       # perf_partials, or None without performance data
+    ambiguous_hosts: dict = field(default_factory=dict)
+
+    def cluster_mask(self, selected_clusters=None):
+        """Bool per label: in scope for selected_clusters (None / "All Clusters" = everything)."""
+        if not selected_clusters or "All Clusters" in selected_clusters:
+            return np.ones(len(self.labels), dtype=bool)
+        return self.labels.isin(list(selected_clusters)) | (self.labels == ALL_ROWS)
+
+    def combine(self, selected_clusters=None, include_off=True):
+        """Metrics dict for one cluster scope and power filter (as aggregate_workload)."""
+        mask = self.cluster_mask(selected_clusters)
+        cols = self.cols
+        db = {
+            'tot_vms': 0, 'tot_vcpu': 0, 'tot_ram': 0, 
+            'vinfo_prov': 0, 'vinfo_used': 0, 
+            'cur_cores': 0, 'cur_host_count': 0, 'cur_total_ram_gb': 0, 'cur_lic_cores': 0, 'lic_skipped_hosts': [],
+            'max_vm_cpu': 0, 'max_vm_ram': 0, 'name_max_cpu': "N/A", 'name_max_ram': "N/A",
+            'ds_cap': 0, 'ds_used': 0, 'ds_free': 0,
+            'has_perf': False, 'perf_ghz_demand': 0, 'lic_edition': "Unknown",
+            'vsan_detected': False, 'vsan_raw_tib': 0,
+            'ambiguous_hosts': self.ambiguous_hosts
+        }
+
+        # 1. VMs
+        vm = self.vm
+        vm = vm[mask[vm.index.get_level_values('cluster')] & (include_off | vm.index.get_level_values('on'))]
+        if vm['n'].sum():
+            db['tot_vms'] = int(vm['n'].sum())
+            if 'vm_cpu' in cols: db['tot_vcpu'] = vm['vcpu'].sum()
+            if 'vm_ram' in cols: db['tot_ram'] = vm['ram'].sum()
+            if 'vm_prov' in cols: db['vinfo_prov'] = vm['prov'].sum() / 1024
+            if 'vm_used' in cols: db['vinfo_used'] = vm['used'].sum() / 1024
+            
+            # Largest VMs: highest value, first in table order on ties
+            for col, key, max_key, name_key in (('vm_cpu', 'vcpu', 'max_vm_cpu', 'name_max_cpu'), ('vm_ram', 'ram', 'max_vm_ram', 'name_max_ram')):
+                if col not in cols: continue
+                best = vm.sort_values([f'max_{key}', f'max_{key}_row'], ascending=[False, True]).iloc[0]
+                db[max_key] = best[f'max_{key}']
+                if 'vm_name' in cols: db[name_key] = self.vm_sizes['name'][int(best[f'max_{key}_row'])]
+            
+            sizes = self.vm_sizes
+            keep = mask[sizes['cluster']] & (include_off | sizes['on'])
+            db['vm_sizes'] = {k: sizes[k][keep] for k in ('name', 'vcpu', 'ram_gb')}
+
+        # 2. Hosts
+        h = self.h[mask[self.h.index]]
+        if h['n'].sum():
+            db['cur_host_count'] = int(h['n'].sum())
+            if 'h_ram' in cols: db['cur_total_ram_gb'] = h['ram'].sum()
+            db['cur_cores'] = h['cores'].sum()
+            if 'h_cpu' in cols and 'h_core' in cols:
+                names, codes = self.lic_skipped
+                db['cur_lic_cores'] = float(h['lic_cores'].sum())
+                db['lic_skipped_hosts'] = names[mask[codes]].tolist()
+
+        # 3. Storage
+        ds = self.ds[mask[self.ds.index]]
+        if ds['n'].sum():
+            if ds['vsan_n'].sum():
+                db['vsan_detected'] = True
+                if 'ds_cap' in cols: db['vsan_raw_tib'] = ds['vsan_cap'].sum() / 1024
+            if 'ds_cap' in cols: db['ds_cap'] = ds['san_cap'].sum() / 1024
+            if 'ds_free' in cols: db['ds_free'] = ds['san_free'].sum() / 1024
+            db['ds_used'] = ds['san_used'].sum() / 1024 if 'ds_used' in cols else db['ds_cap'] - db['ds_free']
+
+        # Live Optics specific vSAN detection: the disk model holding the most capacity
+        d = self.d[mask[self.d.index.get_level_values('cluster')]]
+        if len(d):
+            grp = d.groupby(level='model').sum()
+            winner = grp.loc[grp['tib'].idxmax()]
+            avg_disks = winner['n'] / db['cur_host_count'] if db['cur_host_count'] else 0
+            if avg_disks > 1.0:
+                db['vsan_detected'] = True
+                db['vsan_raw_tib'] = winner['tib']
+
+        # Live Optics performance (demand-based sizing)
+        if self.perf is not None:
+            names = self.labels.where(self.labels != ALL_ROWS, "All")
+            db.update(combine_perf(self.perf, mask, np.asarray(names, dtype=object)))
+        return db
+
+    def table(self):
+        """One row per cluster holding VMs: its vCenter / Datacenter (where known), VMs,
+        vCPU and RAM (GB) across all power states, hosts and host cores. This is what
+        the cluster picker shows; it never touches the tables."""
+        vm = self.vm.groupby(level='cluster')[['n', 'vcpu', 'ram']].sum()
+        out = self.groups.reindex(vm.index).join(pd.DataFrame({'VMs': vm['n'], 'vCPU': vm['vcpu'], 'RAM (GB)': vm['ram']}))
+        out = out.join(self.h[['n', 'cores']].rename(columns={'n': 'Hosts', 'cores': 'Host Cores'}))
+        out[['Hosts', 'Host Cores']] = out[['Hosts', 'Host Cores']].fillna(0)
+        out['Hosts'] = out['Hosts'].astype(int)
+        out = out.set_axis(pd.Index(self.labels[out.index], name="Cluster"))
+        return out.drop(index=ALL_ROWS, errors='ignore').sort_index()
+
+def summarize_clusters(tables, source_type):
+    """Builds the ClusterSummary of normalized (optionally filtered) tables."""
+    df_vm, df_h, df_ds, df_d = tables["vm"], tables["h"], tables["ds"], tables["d"]
+    ent = tables.get("perf_ent")
+    present = [df for df in (df_vm, df_h, df_ds, df_d, ent) if df is not None]
+    labels = pd.Index(sorted({c for df in present if 'ClusterMap' in df.columns for c in df['ClusterMap'].unique()}) + [ALL_ROWS])
+    cols = frozenset(c for df in (df_vm, df_h, df_ds, df_d) if df is not None for c in df.columns)
+    
+    def codes(df):
+        return labels.get_indexer(df['ClusterMap']) if 'ClusterMap' in df.columns else np.full(len(df), len(labels) - 1)
+    
+    def values(df, col):
+        return df[col].to_numpy(dtype='float64') if col in df.columns else np.zeros(len(df))
+
+    # 1. VMs: sums per (cluster, power state); largest VM per group as (value, row)
+    df_vm = df_vm if df_vm is not None else pd.DataFrame()
+    n = len(df_vm)
+    vcpu, ram = values(df_vm, 'vm_cpu'), values(df_vm, 'vm_ram')
+    vm_sizes = {
+        'name': df_vm['vm_name'].to_numpy(dtype=object) if 'vm_name' in df_vm else df_vm.index.astype(str).to_numpy(dtype=object),
+        'vcpu': np.nan_to_num(vcpu), 'ram_gb': np.nan_to_num(ram),
+        'cluster': codes(df_vm), 'on': df_vm['PoweredOn'].to_numpy(dtype=bool) if 'PoweredOn' in df_vm else np.ones(n, dtype=bool),
+    }
+    rows = pd.DataFrame({
+        'cluster': vm_sizes['cluster'], 'on': vm_sizes['on'], 'n': 1, 'vcpu': vcpu, 'ram': ram,
+        'prov': values(df_vm, 'vm_prov'), 'used': values(df_vm, 'vm_used'), 'cpu0': vm_sizes['vcpu'], 'ram0': vm_sizes['ram_gb'],
+    })
+    g = rows.groupby(['cluster', 'on'])
+    vm = g[['n', 'vcpu', 'ram', 'prov', 'used']].sum()
+    group_cols = {k: c for k, c in (('vCenter', 'vCenter'), ('Datacenter', 'vm_datacenter')) if c in df_vm}
+    groups = pd.DataFrame({k: df_vm[c].to_numpy(dtype=object) for k, c in group_cols.items()}, index=vm_sizes['cluster'])
+    groups = groups.groupby(level=0).first()
+    for key, src in (('vcpu', 'cpu0'), ('ram', 'ram0')):
+        top = g[src].idxmax() if n else pd.Series(dtype='int64')
+        vm[f'max_{key}'] = rows[src].to_numpy()[top.to_numpy(dtype='int64')]
+        vm[f'max_{key}_row'] = top.to_numpy(dtype='int64')
+
+    # 2. Hosts
+    df_h = df_h if df_h is not None else pd.DataFrame()
+    if source_type == "RVTools":
+        cores = values(df_h, 'h_cpu') * values(df_h, 'h_core') if 'h_cpu' in df_h and 'h_core' in df_h else np.zeros(len(df_h))
+    else:
+        cores = values(df_h, 'h_core')
+    lic, bad = host_license_cores(df_h, source_type) if 'h_cpu' in df_h and 'h_core' in df_h else (np.zeros(len(df_h)), np.zeros(len(df_h), dtype=bool))
+    h_codes = codes(df_h)
+    h = pd.DataFrame({'cluster': h_codes, 'n': 1, 'ram': values(df_h, 'h_ram'), 'cores': cores, 'lic_cores': np.asarray(lic, dtype='float64')}).groupby('cluster').sum()
+    bad = np.asarray(bad, dtype=bool)
+    h_labels = df_h['h_name'] if 'h_name' in df_h else df_h.index.to_series()
+    lic_skipped = (np.array([str(x) for x in h_labels[bad]], dtype=object), h_codes[bad])
+
+    # 3. Storage: vSAN datastores by type or name, the rest is SAN
+    df_ds = df_ds if df_ds is not None else pd.DataFrame()
+    vsan = np.zeros(len(df_ds), dtype=bool)
+    if 'ds_type' in df_ds: vsan |= (df_ds['ds_type'].astype(str).str.lower() == 'vsan').to_numpy()
+    if 'ds_name' in df_ds: vsan |= df_ds['ds_name'].astype(str).str.contains('vsan|vxrail', case=False, na=False).to_numpy()
+    cap = values(df_ds, 'ds_cap')
+    ds = pd.DataFrame({
+        'cluster': codes(df_ds), 'n': 1, 'vsan_n': vsan.astype(int), 'vsan_cap': np.where(vsan, cap, 0.0),
+        'san_cap': np.where(vsan, 0.0, cap), 'san_free': np.where(vsan, 0.0, values(df_ds, 'ds_free')),
+        'san_used': np.where(vsan, 0.0, values(df_ds, 'ds_used')),
+    }).groupby('cluster').sum()
+
+    # Live Optics host disks: physical capacity disks per (cluster, model)
+    d = pd.DataFrame({'tib': [], 'n': []}, index=pd.MultiIndex.from_arrays([[], []], names=['cluster', 'model']))
+    if df_d is not None and not df_d.empty and 'd_model' in df_d and 'd_cap' in df_d:
+        logical = df_d['d_model'].astype(str).str.contains(LOGICAL_DISK_KWS, case=False, na=False)
+        tib = df_d['d_cap'].fillna(0) / 1024
+        keep = (~logical & ~(tib < 0.3)).to_numpy()
+        d = pd.DataFrame({'cluster': codes(df_d)[keep], 'model': df_d['d_model'].to_numpy()[keep], 'tib': tib.to_numpy()[keep], 'n': 1}).groupby(['cluster', 'model']).sum()
+
+    # Performance samples or sketches
+    perf, sketch = tables.get("perf"), tables.get("perf_sketch")
+    pp = None
+    if ent is not None and ((perf is not None and not perf.empty) or (sketch is not None and not sketch.empty)):
+        pp = perf_partials(ent, perf, sketch, codes(ent), len(labels))
+    
+    return ClusterSummary(source_type, labels, cols, vm, h, ds, d, vm_sizes, groups, lic_skipped, pp, tables.get('ambiguous_hosts', {}))
+
+def aggregate_workload(tables, source_type):
+    """Sums demand and legacy supply over the filtered typed tables into the metrics dict used by sizing and the report."""
+    return summarize_clusters(tables, source_type).combine()
+
+def process_mapped_data(df_vm, df_h, df_ds, df_d, source_type, selected_clusters, include_off, maps):
+    """Runs normalize -> filter -> aggregate in one call (uncached)."""
+    tables = normalize_tables({"vm": df_vm, "h": df_h, "ds": df_ds, "d": df_d}, maps)
+    return aggregate_workload(filter_tables(tables, selected_clusters, include_off), source_type)
+
+# --- SIZING ---
+@dataclass(frozen=True)
+class SizingParams:
+    """Target hardware and constraints. Defaults match the app sidebar."""
+    sockets: int = 2
+    cores: int = 24             # per socket
+    ram_gb: int = 1024
+    vcpu_ratio: float = 5.0
+    cpu_buffer: float = 10      # %
+    ram_buffer: float = 10      # %
+    min_hosts: int = 3
+    ha_nodes: int = 1
+    growth: float = 0.10        # annual, as a fraction
+    years: int = 3
+    core_ghz: float = 2.5       # target core clock, for demand-based sizing
+
+# --- NUMA FIT ---
+NUMA_CLASSES = ["fits", "spans", "exceeds"]
+NUMA_CPU_BINS = [0, 1, 2, 4, 8, 16, 32, 64, 128]       # vCPU bucket lower edges; 0 holds VMs with no vCPU count
+NUMA_RAM_BINS = [0, 4, 8, 16, 32, 64, 128, 256, 512, 1024]  # GB bucket lower edges
+
+def _bin_labels(edges, unit="", whole=False):
+    """Bucket labels from lower edges ("4-7" for whole counts, "4-8 GB" otherwise); the last is open-ended."""
+    def label(lo, hi):
+        if whole: return f"{lo}" if hi - lo == 1 else f"{lo}-{hi - 1}"
+        return f"{lo}-{hi}{unit}"
+    return [label(lo, hi) for lo, hi in zip(edges, edges[1:])] + [f"{edges[-1]}+{unit}"]
+
+def numa_fit(db, sockets, cores, ram_gb, top=10):
+    """Classifies every VM against the target NUMA node (cores per socket, ram_gb /
+    sockets): 'fits' one node, 'spans' several nodes, or 'exceeds' the whole host.
+    Returns class counts, the top offenders (exceeding first, then by how many nodes'
+    worth they need) and vCPU / RAM histograms split by class."""
+    sizes = db.get('vm_sizes')
+    if not sizes or len(sizes['vcpu']) == 0: return None
+    vcpu, ram, names = sizes['vcpu'], sizes['ram_gb'], sizes['name']
+    node_ram = ram_gb / sockets
+    
+    exceeds = (vcpu > sockets * cores) | (ram > ram_gb)
+    fits = (vcpu <= cores) & (ram <= node_ram)
+    cls = np.where(exceeds, 2, np.where(fits, 0, 1))
+    counts = np.bincount(cls, minlength=3)
+    
+    def hist(vals, edges):
+        b = np.clip(np.searchsorted(edges, vals, side='right') - 1, 0, len(edges) - 1)
+        grid = np.bincount(b * 3 + cls, minlength=len(edges) * 3).reshape(len(edges), 3)
+        return {c: grid[:, k].tolist() for k, c in enumerate(NUMA_CLASSES)}
+    
+    severity = np.maximum(vcpu / cores, ram / node_ram)
+    bad = np.flatnonzero(cls > 0)
+    bad = bad[np.lexsort((-severity[bad], -cls[bad]))][:top]
+    offenders = [{'name': str(names[i]), 'vcpu': float(vcpu[i]), 'ram_gb': float(ram[i]),
+                  'class': NUMA_CLASSES[cls[i]], 'nodes': float(severity[i])} for i in bad]
+    
+    return {
+        'counts': dict(zip(NUMA_CLASSES, counts.tolist())), 'offenders': offenders,
+        'cpu_hist': {'bins': _bin_labels(NUMA_CPU_BINS, whole=True), **hist(vcpu, NUMA_CPU_BINS)},
+        'ram_hist': {'bins': _bin_labels(NUMA_RAM_BINS, " GB"), **hist(ram, NUMA_RAM_BINS)},
+    }
+
+def size_workload(db, params):
+    """Host count, efficiency and licensing for one target hardware spec. Cheap: reads only the aggregates in db."""
+    tgt_sockets, tgt_cores, tgt_ram = params.sockets, params.cores, params.ram_gb
+    vcpu_ratio, ha_nodes, growth, years = params.vcpu_ratio, params.ha_nodes, params.growth, params.years
+    
+    host_cap_cores = tgt_sockets * tgt_cores
+    eff_cores = host_cap_cores * (1 - params.cpu_buffer/100)
+    eff_ram = tgt_ram * (1 - params.ram_buffer/100)
+    
+    req_cpu = math.ceil(db['tot_vcpu'] / vcpu_ratio / eff_cores)
+    req_ram = math.ceil(db['tot_ram'] / eff_ram)
+    
+    if req_cpu > req_ram:
+        constraint = "CPU"
+        raw_hosts = req_cpu
+    else:
+        constraint = "RAM"
+        raw_hosts = req_ram
+    
+    mult = (1+growth)**years
+    fut_vcpu = db['tot_vcpu'] * mult
+    fut_hosts = math.ceil(max(fut_vcpu / vcpu_ratio / eff_cores, (db['tot_ram'] * mult) / eff_ram))
+    
+    hosts_now = max(int(raw_hosts) + ha_nodes, params.min_hosts)
+    hosts_fut = max(int(fut_hosts) + ha_nodes, params.min_hosts)
+    
+    ratio_now = db['tot_vcpu'] / (hosts_now * host_cap_cores) if hosts_now else 0
+    ratio_fut = fut_vcpu / (hosts_fut * host_cap_cores) if hosts_fut else 0
+
+    numa = numa_fit(db, tgt_sockets, tgt_cores, tgt_ram)
+
+    # Demand-based host count from measured usage (Live Optics performance), same buffers and HA
+    perf_hosts_rec = 0
+    if db.get('has_perf'):
+        ghz_hosts = math.ceil(db['perf_ghz_demand'] / (eff_cores * params.core_ghz))
+        mem_hosts = math.ceil(db.get('perf_mem_demand', 0) / eff_ram)
+        perf_hosts_rec = max(max(ghz_hosts, mem_hosts) + ha_nodes, params.min_hosts)
+
+    # Licensing Calc
+    lic_per_node = calc_license_cores(tgt_sockets, tgt_cores)
+    now_lic = hosts_now * lic_per_node
+    fut_lic = hosts_fut * lic_per_node
+    
+    return {
+        'eff_cores': eff_cores, 'eff_ram': eff_ram, 'req_cpu': req_cpu, 'req_ram': req_ram,
+        'hosts_now': hosts_now, 'hosts_fut': hosts_fut, 'constraint': constraint,
+        'raw_hosts': raw_hosts, 'ha_nodes': ha_nodes, 'sockets': tgt_sockets, 'cores': tgt_cores, 'ram': tgt_ram,
+        'tgt_numa_cores': tgt_cores, 'tgt_numa_ram': tgt_ram/tgt_sockets, 'growth': growth, 'years': years,
+        'ratio_now': ratio_now, 'ratio_fut': ratio_fut,
+        'cur_ratio': db['tot_vcpu']/db['cur_cores'] if db['cur_cores'] > 0 else 0,
+        'lo_basis': "95th", 'perf_hosts_rec': perf_hosts_rec, 'host_cap_cores': host_cap_cores, 'fut_vcpu': fut_vcpu,
+        'now_lic_cores': now_lic, 'fut_lic_cores': fut_lic, 'lic_diff': fut_lic - db['cur_lic_cores'],
+        'numa_fit': numa, **{f"numa_{c}": (numa['counts'][c] if numa else 0) for c in NUMA_CLASSES},
+    }
+
+# --- SCENARIO SWEEP ---
+# Default grids for sweep_scenarios: common 2-socket-era SKUs and DIMM-friendly RAM sizes.
+SWEEP_DEFAULTS = {
+    'sockets': [1, 2],
+    'cores': [16, 24, 32, 48, 64],
+    'ram_gb': [512, 768, 1024, 1536, 2048],
+    'vcpu_ratio': [3.0, 4.0, 5.0],
+    'ha_nodes': [1],
+}
+SWEEP_RANKS = {
+    'hosts': ['hosts_now', 'now_lic_cores', 'neg_headroom'],
+    'license': ['now_lic_cores', 'hosts_now', 'neg_headroom'],
+    'headroom': ['neg_headroom', 'hosts_now', 'now_lic_cores'],
+}
+
+SWEEP_OUTPUTS = ['hosts_now', 'hosts_fut', 'constraint', 'now_lic_cores', 'fut_lic_cores',
+                 'cpu_headroom', 'ram_headroom', 'headroom', 'ratio_now']
+
+def vector_sizing(db, g):
+    """size_workload's arithmetic over arrays: g maps every SizingParams field to an
+    equal-length array. Returns the SWEEP_OUTPUTS columns as arrays."""
+    tot_vcpu, tot_ram = float(db['tot_vcpu']), float(db['tot_ram'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        host_cap_cores = g['sockets'] * g['cores']
+        eff_cores = host_cap_cores * (1 - g['cpu_buffer']/100)
+        eff_ram = g['ram_gb'] * (1 - g['ram_buffer']/100)
+        
+        req_cpu = np.ceil(tot_vcpu / g['vcpu_ratio'] / eff_cores)
+        req_ram = np.ceil(tot_ram / eff_ram)
+        raw_hosts = np.maximum(req_cpu, req_ram)
+        
+        mult = (1 + g['growth'])**g['years']
+        fut_hosts = np.ceil(np.maximum(tot_vcpu * mult / g['vcpu_ratio'] / eff_cores, tot_ram * mult / eff_ram))
+        hosts_now = np.maximum(raw_hosts + g['ha_nodes'], g['min_hosts'])
+        hosts_fut = np.maximum(fut_hosts + g['ha_nodes'], g['min_hosts'])
+        
+        lic_per_node = calc_license_cores(g['sockets'], g['cores'])
+        active = np.maximum(hosts_now - g['ha_nodes'], 1)
+        cpu_headroom = 1 - (tot_vcpu / g['vcpu_ratio']) / (active * eff_cores)
+        ram_headroom = 1 - tot_ram / (active * eff_ram)
+        ratio_now = tot_vcpu / (hosts_now * host_cap_cores)
+    
+    return {
+        'hosts_now': hosts_now.astype(int), 'hosts_fut': hosts_fut.astype(int),
+        'constraint': np.where(req_cpu > req_ram, "CPU", "RAM"),
+        'now_lic_cores': (hosts_now * lic_per_node).astype(int), 'fut_lic_cores': (hosts_fut * lic_per_node).astype(int),
+        'cpu_headroom': cpu_headroom, 'ram_headroom': ram_headroom,
+        'headroom': np.minimum(cpu_headroom, ram_headroom), 'ratio_now': ratio_now,
+    }
+
+def sweep_scenarios(db, base=None, rank_by='license', **grids):
+    """size_workload over every combination of the given grids in one NumPy pass.
+
+    Grids are lists for any SizingParams field (sockets, cores, ram_gb, vcpu_ratio,
+    cpu_buffer, ram_buffer, min_hosts, ha_nodes, growth, years); fields not given take
+    their value from base (default SizingParams()). Host counts and licensing match
+    size_workload exactly. headroom is the spare CPU/RAM share (the smaller of the two)
+    with the HA nodes out of service. Returns a DataFrame ranked by SWEEP_RANKS[rank_by].
+    """
+    base = base or SizingParams()
+    names = list(SizingParams.__dataclass_fields__)
+    axes = [np.asarray(grids.get(n, [getattr(base, n)]), dtype='float64') for n in names]
+    g = dict(zip(names, (a.ravel() for a in np.meshgrid(*axes, indexing='ij'))))
+    
+    v = vector_sizing(db, g)
+    
+    out = pd.DataFrame({
+        'sockets': g['sockets'].astype(int), 'cores': g['cores'].astype(int), 'ram_gb': g['ram_gb'].astype(int),
+        'vcpu_ratio': g['vcpu_ratio'], 'ha_nodes': g['ha_nodes'].astype(int),
+        'cpu_buffer': g['cpu_buffer'], 'ram_buffer': g['ram_buffer'], 'min_hosts': g['min_hosts'].astype(int),
+        'growth': g['growth'], 'years': g['years'].astype(int),
+        **{k: v[k] for k in SWEEP_OUTPUTS},
+    })
+    keys = [(-out['headroom'] if k == 'neg_headroom' else out[k]).to_numpy() for k in SWEEP_RANKS[rank_by]]
+    order = np.lexsort(keys[::-1])
+    return out.iloc[order].reset_index(drop=True)
+
+# --- CATALOG OPTIMIZER ---
+# Orderable server SKUs: cores are per socket, ram_gb lists the DIMM-feasible sizes
+# (list or "256, 512" text), cost is relative: base_cost + ram_gb * cost_per_gb per host.
+EXAMPLE_CATALOG = [
+    {'sku': "1S-32C", 'sockets': 1, 'cores': 32, 'ram_gb': [256, 384, 512, 768, 1024], 'base_cost': 8.0, 'cost_per_gb': 0.008},
+    {'sku': "1S-64C", 'sockets': 1, 'cores': 64, 'ram_gb': [512, 768, 1024, 1536], 'base_cost': 12.0, 'cost_per_gb': 0.008},
+    {'sku': "2S-16C", 'sockets': 2, 'cores': 16, 'ram_gb': [256, 512, 768, 1024], 'base_cost': 10.0, 'cost_per_gb': 0.008},
+    {'sku': "2S-24C", 'sockets': 2, 'cores': 24, 'ram_gb': [512, 768, 1024, 1536, 2048], 'base_cost': 13.0, 'cost_per_gb': 0.008},
+    {'sku': "2S-32C", 'sockets': 2, 'cores': 32, 'ram_gb': [512, 1024, 1536, 2048], 'base_cost': 16.0, 'cost_per_gb': 0.008},
+    {'sku': "2S-48C", 'sockets': 2, 'cores': 48, 'ram_gb': [1024, 1536, 2048, 3072], 'base_cost': 22.0, 'cost_per_gb': 0.008},
+]
+
+CATALOG_COLUMNS = ['sku', 'sockets', 'cores', 'ram_gb', 'cost']
+
+def expand_catalog(catalog):
+    """One row per orderable (SKU, RAM size) with its per-host cost. Rows missing
+    sockets, cores or RAM are skipped; zero or negative values raise ValueError."""
+    df = pd.DataFrame(catalog).copy()
+    if df.empty: return pd.DataFrame(columns=CATALOG_COLUMNS)
+    missing = [c for c in ('sku', 'sockets', 'cores', 'ram_gb') if c not in df]
+    if missing: raise ValueError(f"Catalog is missing column(s): {', '.join(missing)}")
+    for col, default in (('base_cost', 0.0), ('cost_per_gb', 0.0)):
+        if col not in df: df[col] = default
+    df['ram_gb'] = df['ram_gb'].map(lambda v: [float(x) for x in str(v).strip("[]").split(",") if x.strip()]
+                                    if isinstance(v, str) else v)
+    df = df.explode('ram_gb', ignore_index=True).dropna(subset=['ram_gb'])
+    for col in ('sockets', 'cores', 'ram_gb', 'base_cost', 'cost_per_gb'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(subset=['sockets', 'cores', 'ram_gb']).reset_index(drop=True)
+    bad = df.loc[(df[['sockets', 'cores', 'ram_gb']] <= 0).any(axis=1), 'sku']
+    if len(bad):
+        raise ValueError(f"Catalog sockets, cores and RAM must be positive: {', '.join(map(str, bad.unique()))}")
+    df['cost'] = df['base_cost'].fillna(0) + df['ram_gb'] * df['cost_per_gb'].fillna(0)
+    return df[CATALOG_COLUMNS]
+
+def optimize_catalog(db, catalog, params=None, objective='cost', core_price=0.0, horizon='now', top=10):
+    """Best catalog configurations for the workload under params' ratio, buffers,
+    min_hosts and N+ha_nodes (sockets/cores/ram_gb in params are ignored).
+
+    objective 'cost' minimises hosts * host cost + licensed cores * core_price;
+    'license' minimises licensed cores, with cost breaking ties. horizon 'future' sizes
+    for growth over params.years. Host counts are closed-form per configuration, so the
+    whole catalog is scored in one vectorized pass and only the top candidates (found
+    with argpartition) are sorted. attrs['catalog_rows'] holds the expanded catalog size.
+    """
+    params = params or SizingParams()
+    cat = expand_catalog(catalog)
+    if cat.empty: return cat
+    mult = (1 + params.growth)**params.years if horizon == 'future' else 1.0
+    vcpu, ram = db['tot_vcpu'] * mult, db['tot_ram'] * mult
+    
+    sockets, cores, ram_gb, cost = (cat[c].to_numpy(dtype='float64') for c in ('sockets', 'cores', 'ram_gb', 'cost'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cpu_hosts = np.ceil(vcpu / params.vcpu_ratio / (sockets * cores * (1 - params.cpu_buffer/100)))
+        ram_hosts = np.ceil(ram / (ram_gb * (1 - params.ram_buffer/100)))
+    hosts = np.maximum(np.maximum(cpu_hosts, ram_hosts) + params.ha_nodes, params.min_hosts)
+    lic_cores = hosts * calc_license_cores(sockets, cores)
+    total_cost = hosts * cost + lic_cores * core_price
+    
+    # Lexicographic key folded into one float: objective first, tie-breaks scaled below it
+    if objective == 'license':
+        key = lic_cores + total_cost / (np.nanmax(total_cost) + 1) * 0.5
+    else:
+        key = total_cost + hosts / (np.nanmax(hosts) + 1) * 1e-6
+    key = np.where(np.isfinite(key), key, np.inf)
+    k = min(top, len(key))
+    idx = np.argpartition(key, k - 1)[:k]
+    idx = idx[np.argsort(key[idx], kind='stable')]
+    
+    out = cat.iloc[idx].reset_index(drop=True)
+    out['hosts'] = hosts[idx].astype(int)
+    out['lic_cores'] = lic_cores[idx].astype(int)
+    out['total_cost'] = total_cost[idx]
+    out['constraint'] = np.where(cpu_hosts[idx] > ram_hosts[idx], "CPU", "RAM")
+    out = out[np.isfinite(key[idx])].reset_index(drop=True)
+    out.attrs['catalog_rows'] = len(cat)
+    return out
+
+# --- PLACEMENT SIMULATION ---
+# Packs each VM onto target hosts instead of dividing totals. VMs are bucketed into
+# (vCPU, RAM rounded up to ram_step_gb) shapes and the shapes are placed largest first;
+# every VM of a shape is placed in one array operation over the per-node free
+# capacity, which is equivalent to placing them one at a time.
+def place_vms(vm_cpu, vm_ram, params, numa=False, strategy="ffd", ram_step_gb=1.0):
+    """Packs VMs onto hosts of params' spec with first-fit-decreasing ("ffd") or
+    best-fit-decreasing ("bfd", fullest host that still fits).
+
+    Capacity per host is sockets * cores * (1 - cpu_buffer) * vcpu_ratio vCPU and
+    ram_gb * (1 - ram_buffer) GB. With numa=True each socket is a separate bin: a VM
+    that fits a NUMA node (vCPU <= cores, RAM within the node's share) goes on one node,
+    a wider one takes an equal slice of every node of its host. VMs too big for a
+    host are left unplaced ('unplaced'); VMs with no vCPU and no RAM (templates, blank
+    rows) take no capacity and are not packed ('zero_size'). Returns a dict with the
+    packed and final (N+ha_nodes, min_hosts) host counts, 'assignment' (host per VM, -1
+    if not placed) and 'host_util', a per-host utilization frame.
+    """
+    cpu = np.nan_to_num(np.asarray(vm_cpu, dtype='float64'))
+    ram = np.nan_to_num(np.asarray(vm_ram, dtype='float64'))
+    nodes = int(params.sockets) if numa else 1
+    node_cpu = params.sockets * params.cores * (1 - params.cpu_buffer/100) * params.vcpu_ratio / nodes
+    node_ram = params.ram_gb * (1 - params.ram_buffer/100) / nodes
+    
+    q_cpu = np.ceil(cpu)
+    q_ram = np.ceil(ram / ram_step_gb) * ram_step_gb
+    too_big = (q_cpu > node_cpu * nodes) | (q_ram > node_ram * nodes) | (cpu > params.sockets * params.cores)
+    zero = (q_cpu <= 0) & (q_ram <= 0)
+    wide = ((q_cpu > min(params.cores, node_cpu)) | (q_ram > node_ram)) if numa else np.zeros(len(cpu), bool)
+    
+    assignment = np.full(len(cpu), -1, dtype=np.int64)
+    ok = np.flatnonzero(~too_big & ~zero)
+    shapes, inverse = np.unique(np.column_stack([q_cpu[ok], q_ram[ok], wide[ok]]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    members = np.split(ok[np.argsort(inverse, kind='stable')], np.cumsum(np.bincount(inverse, minlength=len(shapes)))[:-1])
+    share = np.maximum(shapes[:, 0] / (node_cpu * nodes), shapes[:, 1] / (node_ram * nodes))
+    
+    # Array-backed node state; host h owns nodes h*nodes .. h*nodes+nodes-1
+    free_cpu = np.empty(0)
+    free_ram = np.empty(0)
+    
+    def fill(c, r, span, count, first_host=0):
+        """Places count VMs of one shape on hosts >= first_host; returns (bin ids, taken)."""
+        fc, fr = free_cpu[first_host * nodes:], free_ram[first_host * nodes:]
+        if span == 1:
+            fit = np.floor(np.minimum(fc / c if c else np.inf, fr / r if r else np.inf) + 1e-9)
+            bins = np.arange(first_host * nodes, len(free_cpu))
+            level = fc / node_cpu + fr / node_ram
+        else:
+            fc, fr = fc.reshape(-1, nodes), fr.reshape(-1, nodes)
+            fit = np.floor(np.minimum(fc / (c/nodes) if c else np.inf, fr / (r/nodes) if r else np.inf).min(axis=1) + 1e-9)
+            bins = np.arange(first_host, len(free_cpu) // nodes)
+            level = (fc / node_cpu + fr / node_ram).sum(axis=1)
+        fit = np.minimum(fit, count)
+        sel = np.flatnonzero(fit > 0)
+        if strategy == "bfd": sel = sel[np.argsort(level[sel], kind='stable')]
+        before = np.cumsum(fit[sel]) - fit[sel]
+        take = np.clip(count - before, 0, fit[sel]).astype(np.int64)
+        used = take > 0
+        bins, take = bins[sel][used], take[used]
+        if span == 1:
+            free_cpu[bins] -= take * c
+            free_ram[bins] -= take * r
+        else:
+            node_ids = (bins[:, None] * nodes + np.arange(nodes)).ravel()
+            free_cpu[node_ids] -= np.repeat(take, nodes) * (c / nodes)
+            free_ram[node_ids] -= np.repeat(take, nodes) * (r / nodes)
+        return bins, take
+    
+    for s_i in np.argsort(-share, kind='stable'):
+        c, r, is_wide = shapes[s_i]
+        span = nodes if is_wide else 1
+        vms = members[s_i]
+        placed_bins, placed_take = [], []
+        bins, take = fill(c, r, span, len(vms))
+        placed_bins.append(bins); placed_take.append(take)
+        rest = len(vms) - take.sum()
+        if rest > 0:
+            # Open just enough empty hosts for the remainder
+            per_node = np.floor(min(node_cpu / (c / span) if c else np.inf, node_ram / (r / span) if r else np.inf) + 1e-9)
+            per_host = per_node * nodes if span == 1 else per_node
+            new = int(math.ceil(rest / per_host))
+            first = len(free_cpu) // nodes
+            free_cpu = np.concatenate([free_cpu, np.full(new * nodes, node_cpu)])
+            free_ram = np.concatenate([free_ram, np.full(new * nodes, node_ram)])
+            bins, take = fill(c, r, span, rest, first)
+            placed_bins.append(bins); placed_take.append(take)
+        hosts_of = np.concatenate([b // nodes if span == 1 else b for b in placed_bins])
+        assignment[vms] = np.repeat(hosts_of, np.concatenate(placed_take))
+    
+    n_hosts = len(free_cpu) // nodes
+    placed = assignment >= 0
+    cap_cpu, cap_ram = node_cpu * nodes, node_ram * nodes
+    host_util = pd.DataFrame({
+        'host': np.arange(n_hosts) + 1,
+        'vms': np.bincount(assignment[placed], minlength=n_hosts),
+        'vcpu': np.bincount(assignment[placed], weights=cpu[placed], minlength=n_hosts),
+        'ram_gb': np.bincount(assignment[placed], weights=ram[placed], minlength=n_hosts),
+    })
+    host_util['cpu_util'] = host_util['vcpu'] / cap_cpu
+    host_util['ram_util'] = host_util['ram_gb'] / cap_ram
+    return {
+        'hosts_packed': n_hosts,
+        'hosts': max(n_hosts + params.ha_nodes, params.min_hosts),
+        'assignment': assignment, 'unplaced': np.flatnonzero(too_big), 'zero_size': np.flatnonzero(zero),
+        'host_util': host_util, 'strategy': strategy, 'numa': numa,
+        'avg_cpu_util': float(host_util['cpu_util'].mean()) if n_hosts else 0.0,
+        'avg_ram_util': float(host_util['ram_util'].mean()) if n_hosts else 0.0,
+    }
+
+def place_workload(tables, params, numa=False, strategy="ffd"):
+    """place_vms over the filtered typed VM table; adds the names of unplaced and zero-size VMs."""
+    df_vm = tables.get("vm")
+    if df_vm is None or df_vm.empty or 'vm_cpu' not in df_vm or 'vm_ram' not in df_vm:
+        return None
+    res = place_vms(df_vm['vm_cpu'].to_numpy(), df_vm['vm_ram'].to_numpy(), params, numa, strategy)
+    names = df_vm['vm_name'] if 'vm_name' in df_vm else pd.Series(df_vm.index.astype(str), index=df_vm.index)
+    res['unplaced_names'] = [str(x) for x in names.iloc[res['unplaced']]]
+    res['zero_size_names'] = [str(x) for x in names.iloc[res['zero_size']]]
+    return res
+
+@dataclass
+class SizingResult:
+    """Output of size_export: the aggregated workload, the sizing for one SizingParams,
+    and `report`, the flat dict generate_html_report consumes."""
+    src_type: str
+    maps: dict
+    selected_clusters: list
+    workload: dict
+    sizing: dict
+    report: dict = field(init=False)
+
+    def __post_init__(self):
+        self.report = {**self.workload, 'src_type': self.src_type, **self.sizing}
+
+    @property
+    def scope_name(self):
+        c = self.selected_clusters
+        return ", ".join(c) if len(c) < 4 else f"{len(c)} Clusters Selected"
+
+def size_tables(src_type, df_map, params=None, selected_clusters=None, include_off=True, maps=None):
+    """Sizes already-loaded tables: auto-map (unless maps is given), aggregate and size.
+    selected_clusters defaults to the whole estate."""
+    params = params or SizingParams()
+    selected_clusters = list(selected_clusters or ["All Clusters"])
+    maps = maps or auto_map(df_map)
+    
+    tables = filter_tables(normalize_tables(df_map, maps), selected_clusters, include_off)
+    db = aggregate_workload(tables, src_type)
+    return SizingResult(src_type, maps, selected_clusters, db, size_workload(db, params))
+
+def size_export(file, params=None, selected_clusters=None, include_off=True, maps=None, streaming=False, cache_dir=None):
+    """Headless equivalent of one app session on a single export."""
+    src_type, df_map = load_tables_cached(file, streaming, cache_dir)
+    if src_type == "Unknown":
+        raise ValueError(f"Unrecognized export format: {getattr(file, 'name', file)}")
+    return size_tables(src_type, df_map, params, selected_clusters, include_off, maps)
+
+def size_merged(files, params=None, selected_clusters=None, include_off=True, maps=None, max_workers=None, streaming=False, cache_dir=None):
+    """Sizes several exports (paths) as one estate: parsed in parallel, merged with
+    duplicate VMs removed, aggregated once. The merge info is stored on report['merge']."""
+    src_type, df_map, info = merge_exports(load_many(files, max_workers, streaming, cache_dir), files)
+    res = size_tables(src_type, df_map, params, selected_clusters, include_off, maps)
+    res.report['merge'] = info
+    return res
+
+# --- REPORT GENERATOR ---
+def generate_html_report(data, scope_name, source_filename, customer_name, logo_url):
+    now = datetime.now().strftime("%Y-%m-%d")
+    lic_prefix = "+" if data.get('lic_diff', 0) > 0 else ""
+    lic_color = "#d9534f" if data.get('lic_diff', 0) > 0 else "#28a745"
+
+    vm_check_html = "<div style='color:#666;'>No VM data found.</div>"
+    if data.get('max_vm_cpu', 0) > 0:
+        cpu_stat = "⚠️ Exceeds Socket" if data['max_vm_cpu'] > data['tgt_numa_cores'] else "✅ Fits NUMA"
+        ram_stat = "⚠️ Exceeds Socket" if data['max_vm_ram'] > data['tgt_numa_ram'] else "✅ Fits NUMA"
+        vm_check_html = f"""
+        <div style="font-size:0.9em; margin-bottom:5px;"><strong>{data['name_max_cpu']}</strong>: {data['max_vm_cpu']} vCPU ({cpu_stat})</div>
+        <div style="font-size:0.9em;"><strong>{data['name_max_ram']}</strong>: {data['max_vm_ram']:.0f} GB RAM ({ram_stat})</div>"""
+
+    numa_html = ""
+    numa = data.get('numa_fit')
+    if numa:
+        cnt = numa['counts']
+        offender_rows = "".join(
+            f"<tr><td>{o['name']}</td><td>{o['vcpu']:,.0f}</td><td>{o['ram_gb']:,.0f} GB</td><td>{'⚠️ Exceeds Host' if o['class'] == 'exceeds' else 'Spans Nodes'}</td></tr>"
+            for o in numa['offenders'])
+        def hist_rows(h):
+            return "".join(
+                f"<tr><td>{b}</td><td>{f}</td><td>{sp}</td><td>{ex}</td></tr>"
+                for b, f, sp, ex in zip(h['bins'], h['fits'], h['spans'], h['exceeds'])
+                if f or sp or ex)
+        numa_html = f"""
+        <div class="card">
+            <div class="section-label">NUMA Fit (All VMs)</div>
+            <div class="grid" style="grid-template-columns: 1fr 1fr 1fr;">
+                <div><div style="font-size:0.9em; color:#666;">Fit One Node</div><div class="metric">{cnt['fits']:,}</div></div>
+                <div><div style="font-size:0.9em; color:#666;">Span Nodes</div><div class="metric">{cnt['spans']:,}</div></div>
+                <div><div style="font-size:0.9em; color:#666;">Exceed Host</div><div class="metric" style="color:{'#d9534f' if cnt['exceeds'] else '#2c3e50'};">{cnt['exceeds']:,}</div></div>
+            </div>
+            <div class="grid" style="margin-top:10px;">
+                <div>
+                    <span class="section-label">vCPU Distribution</span>
+                    <table><tr><th>vCPU</th><th>Fit</th><th>Span</th><th>Exceed</th></tr>{hist_rows(numa['cpu_hist'])}</table>
+                </div>
+                <div>
+                    <span class="section-label">RAM Distribution</span>
+                    <table><tr><th>RAM</th><th>Fit</th><th>Span</th><th>Exceed</th></tr>{hist_rows(numa['ram_hist'])}</table>
+                </div>
+            </div>
+            <div style="margin-top:10px;">
+                <span class="section-label">Top Offenders</span>
+                <table><tr><th>VM</th><th>vCPU</th><th>RAM</th><th>Status</th></tr>{offender_rows or "<tr><td colspan='4'>None</td></tr>"}</table>
+            </div>
+        </div>"""
+
+    vsan_html = ""
+    rvtools_warn = ""
+    if data.get('src_type') == 'RVTools':
+        rvtools_warn = "<br><br><i style='color:#c62828; font-size:0.85em;'>⚠️ <b>Note:</b> The RVTools vSAN capacity estimate excludes the cache tier and formatting overhead. A hardware BOM or Live Optics run is required for down-to-the-byte licensing accuracy.</i>"
+        
+    if data.get('vsan_detected'):
+        if data.get('vsan_raw_tib', 0) > 0:
+            vsan_html = f"""
+            <div style="margin-top:10px; padding:8px; background:#e8f5e9; border:1px solid #c8e6c9; color:#2e7d32; border-radius:4px; font-size:0.9em;">
+                <strong>✅ vSAN/VxRail Detected in Source</strong><br>
+                Raw Capacity: <strong>{data['vsan_raw_tib']:,.1f} TiB</strong><br>
+                <i>Note: Raw TiB is used for VVF/VCF licensing. Usable capacity depends on RAID policy.</i>{rvtools_warn}
+            </div>"""
+        else:
+            vsan_html = f"""
+            <div style="margin-top:10px; padding:8px; background:#e8f5e9; border:1px solid #c8e6c9; color:#2e7d32; border-radius:4px; font-size:0.9em;">
+                <strong>✅ vSAN/VxRail Detected in Source</strong><br>
+                <i>Note: Storage capacity planning for vSAN depends on RAID policy (RAID1/5/6) and is not calculated here.</i>{rvtools_warn}
+            </div>"""
+
+    perf_html = ""
+    if data.get('has_perf'):
+        stats = data.get('perf_stats', {})
+        perf_rows = "".join(
+            f"<tr><td>{label}</td>" + "".join(f"<td>{stats[k][q]:,.1f} {unit}</td>" for q in PERF_QUANTILES) + "</tr>"
+            for k, label, unit in (('cpu_ghz', "CPU", "GHz"), ('mem_gb', "Memory", "GB")) if k in stats)
+        if data.get('perf_coincident'):
+            summed = data['perf_stats_sum']
+            perf_rows += "".join(
+                f"<tr><td>{label}, sum of per-VM</td>" + "".join(f"<td>{summed[k][q]:,.1f} {unit}</td>" for q in PERF_QUANTILES) + "</tr>"
+                for k, label, unit in (('cpu_ghz', "CPU", "GHz"), ('mem_gb', "Memory", "GB")))
+        perf_html = f"""
+        <h2>6. Performance Analysis (Live Optics)</h2>
+        <div class="card">
+            <div class="section-label">Allocation vs. Consumption ({data['lo_basis']}{', coincident' if data.get('perf_coincident') else ''})</div>
+            <div class="grid">
+                <div>
+                    <div style="font-size:0.9em; color:#666;">Allocated (Entitlement)</div>
+                    <div class="metric">{data['tot_vcpu']:,.0f} vCPU</div>
+                </div>
+                <div>
+                    <div style="font-size:0.9em; color:#666;">Consumed ({data['lo_basis']})</div>
+                    <div class="metric">{data['perf_ghz_demand']:,.1f} GHz</div>
+                </div>
+            </div>
+            <div style="margin-top:10px; padding-top:10px; border-top:1px solid #ddd;">
+                <div style="font-size:1.1em; margin-bottom:10px;">Workload requires <strong>{data['perf_hosts_rec']} Hosts</strong> to satisfy demand (vs. {data['hosts_now']} by allocation).</div>
+            </div>
+            <table>
+                <tr><th>Measured ({data.get('perf_entities', 0):,} {'VMs' if data.get('perf_basis') == 'vm' else 'Hosts'}, {data.get('perf_samples', 0):,} samples)</th><th>95th</th><th>99th</th><th>Peak</th></tr>
+                {perf_rows}
+            </table>
+        </div>"""
+
+    html = f"""
+    <html>
+    <head>
+        <title>Sizing Report - {customer_name}</title>
+        <style>
+            body {{ font-family: "Segoe UI", sans-serif; max-width: 1000px; margin: auto; padding: 40px; color: #333; background: #fff; }}
+            .header-container {{ border-bottom: 3px solid #004B87; padding-bottom: 20px; margin-bottom: 30px; display: flex; justify-content: space-between; align-items: center; }}
+            .header-text h1 {{ margin: 0; font-size: 24px; color: #000; text-transform: uppercase; letter-spacing: 1px; }}
+            .header-logo img {{ max-height: 60px; }}
+            h2 {{ color: #004B87; border-left: 5px solid #004B87; padding-left: 10px; margin-top: 40px; text-transform: uppercase; font-size: 1.1em; }}
+            .card {{ background: #f9f9f9; padding: 20px; border-radius: 4px; border: 1px solid #eee; margin-bottom: 20px; page-break-inside: avoid; }}
+            .grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 20px; }}
+            .metric {{ font-size: 1.6em; font-weight: bold; color: #2c3e50; margin: 5px 0; }}
+            .section-label {{ font-weight: bold; color: #004B87; text-transform: uppercase; font-size: 0.8em; display:block; margin-bottom: 8px; }}
+            table {{ width: 100%; border-collapse: collapse; margin-bottom: 10px; table-layout: fixed; }}
+            th, td {{ border-bottom: 1px solid #ddd; padding: 8px; text-align: left; font-size: 0.9em; overflow: hidden; white-space: nowrap; text-overflow: ellipsis; }}
+            th {{ background-color: #f1f1f1; color: #555; text-transform: uppercase; font-size: 0.8em; width: 40%; }}
+            td {{ width: 60%; }}
+            .lic-delta {{ font-weight: bold; color: {lic_color}; }}
+            .footer {{ margin-top:50px; text-align:center; color:#999; font-size:0.8em; border-top: 1px solid #eee; padding-top: 20px; }}
+        </style>
+    </head>
+    <body>
+        <div class="header-container">
+            <div class="header-text">
+                <h1>{APP_TITLE}</h1>
+                <div style="color:#666; font-size:14px;">Prepared for <strong>{customer_name}</strong> | {now}</div>
+                <div style="color:#666; font-size:12px; margin-top:5px;">Scope: {scope_name}</div>
+            </div>
+            <div class="header-logo"><img src="{logo_url}"></div>
+        </div>
+        
+        <h2>1. Executive Sizing Recommendation</h2>
+        <div class="grid">
+            <div class="card" style="background-color: #e6f3ff; border: 1px solid #b6d4fe;">
+                <div class="section-label">Current Refresh Requirement</div>
+                <div class="metric">{data['hosts_now']} Hosts</div>
+                <div>Configuration: N+{data['ha_nodes']}</div>
+                <div>Efficiency: <strong>{data['ratio_now']:.1f}:1</strong> vCPU:pCPU</div>
+                <div style="margin-top:10px; font-size:0.9em;">Constraint: <strong>{data['constraint']} Bound</strong></div>
+            </div>
+            <div class="card" style="background-color: #e6f3ff; border: 1px solid #b6d4fe;">
+                <div class="section-label">Future Requirement</div>
+                <div class="metric">{data['hosts_fut']} Hosts</div>
+                <div>Growth Model: {data['growth']*100:.0f}% Annually over {data['years']} Years</div>
+                <div>Efficiency: <strong>{data['ratio_fut']:.1f}:1</strong> vCPU:pCPU</div>
+                <div>Projected vCPU: {data['fut_vcpu']:,.0f}</div>
+            </div>
+        </div>
+
+        <div class="card">
+            <div class="section-label">Target Hardware Specification</div>
+            <div class="grid" style="grid-template-columns: 1fr 1fr 1fr;">
+                <div>
+                    <div><strong>Per Node Config</strong></div>
+                    <div>{data['sockets']} Sockets x {data['cores']} Cores</div>
+                    <div>{data['host_cap_cores']} Physical Cores</div>
+                    <div>{data['ram']} GB RAM</div>
+                </div>
+                <div>
+                    <div><strong>Cluster Capacity (Day 1)</strong></div>
+                    <div>{data['hosts_now'] * data['host_cap_cores']} Total Cores</div>
+                    <div>{data['hosts_now'] * data['ram']:,.0f} GB Total RAM</div>
+                </div>
+                <div>
+                    <div><strong>Cluster Capacity (Future)</strong></div>
+                    <div>{data['hosts_fut'] * data['host_cap_cores']} Total Cores</div>
+                    <div>{data['hosts_fut'] * data['ram']:,.0f} GB Total RAM</div>
+                </div>
+            </div>
+        </div>
+
+        <h2>2. Workload Scope</h2>
+        <div class="card">
+            <div class="grid">
+                <div>
+                    <span class="section-label">Legacy Supply (Consolidated)</span>
+                    <table>
+                        <tr><th>Hosts</th><td>{data['cur_host_count']}</td></tr>
+                        <tr><th>Physical Cores</th><td>{data['cur_cores']:,.0f}</td></tr>
+                        <tr><th>Total RAM</th><td>{data['cur_total_ram_gb']:,.0f} GB</td></tr>
+                    </table>
+                </div>
+                <div>
+                    <span class="section-label">VM Demand</span>
+                    <table>
+                        <tr><th>VMs</th><td>{data['tot_vms']}</td></tr>
+                        <tr><th>vCPU</th><td>{data['tot_vcpu']:,.0f}</td></tr>
+                        <tr><th>vRAM</th><td>{data['tot_ram']:,.0f} GB</td></tr>
+                        <tr><th>Current Ratio</th><td><strong>{data['cur_ratio']:.1f}:1</strong></td></tr>
+                    </table>
+                </div>
+            </div>
+        </div>
+
+        <h2>3. Storage Requirements</h2>
+        <div class="grid">
+            <div class="card">
+                <div class="section-label">VM Allocation (vInfo)</div>
+                <table>
+                    <tr><th>Provisioned</th><td><strong>{data.get('vinfo_prov', 0):,.1f} TB</strong></td></tr>
+                    <tr><th>In Use</th><td><strong>{data.get('vinfo_used', 0):,.1f} TB</strong></td></tr>
+                </table>
+            </div>
+            <div class="card">
+                <div class="section-label">Infrastructure</div>
+                <div style="font-size:0.8em; color:#666; margin-bottom:8px;">
+                    <i>Includes VMFS, NFS, and shared SAN/LUNs (excludes vSAN/VxRail).</i>
+                </div>
+                <table>
+                    <tr><th>Total Capacity</th><td><strong>{data['ds_cap']:,.1f} TB</strong></td></tr>
+                    <tr><th>Free Space</th><td><strong>{data['ds_free']:,.1f} TB</strong></td></tr>
+                </table>
+                {vsan_html}
+            </div>
+        </div>
+
+        <h2>4. Architecture & NUMA</h2>
+        <div class="grid">
+            <div class="card">
+                <div class="section-label">NUMA Boundary</div>
+                <table>
+                    <tr><th>Hardware</th><th>Cores</th><th>Memory</th></tr>
+                    <tr><td>Target</td><td>{data['tgt_numa_cores']}</td><td>{data['tgt_numa_ram']:.0f} GB</td></tr>
+                </table>
+            </div>
+            <div class="card">
+                <div class="section-label">Large VM Check</div>
+                {vm_check_html}
+            </div>
+        </div>
+        {numa_html}
+
+        <h2>5. Licensing Impact</h2>
+        <div class="card">
+            <div class="grid" style="grid-template-columns: 1fr 1fr 1fr;">
+                <div>
+                    <div class="section-label">Legacy State</div>
+                    <div class="metric">{data['cur_lic_cores']:,.0f} Cores</div>
+                    <div style="margin-bottom:10px;">{data['cur_host_count']} Hosts</div>
+                </div>
+                <div>
+                    <div class="section-label">Current Refresh</div>
+                    <div class="metric">{data['now_lic_cores']:,.0f} Cores</div>
+                    <div style="margin-bottom:10px;">{data['hosts_now']} Hosts</div>
+                </div>
+                <div>
+                    <div class="section-label">Future w/ Growth</div>
+                    <div class="metric">{data['fut_lic_cores']:,.0f} Cores</div>
+                    <div class="lic-delta">Net: {lic_prefix}{data['lic_diff']} Cores</div>
+                </div>
+            </div>
+        </div>
+
+        {perf_html}
+        
+        <div class="footer">Generated by {APP_TITLE} | Source: {source_filename}</div>
+    </body>
+    </html>
+    """
+    return html
@@ -0,0 +1,462 @@
+"""Engine checks against straightforward reference implementations: python -m pytest"""
+import dataclasses
+import os
+import re
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from sizing_engine import (
+    EXAMPLE_CATALOG, HostClusterResolver, NUM_CELL_RE, PERF_MAX_SLOTS, PERF_METRICS, PERF_SKETCH_ALPHA, PERF_SKETCH_MIN,
+    REQ_MAPS, SizingParams, aggregate_workload, auto_map, cache_path, coincident_series, expand_catalog, file_digest,
+    filter_tables, generate_html_report, load_tables, load_tables_cached, match_col, merge_perf, normalize_tables,
+    optimize_catalog, parse_float, place_vms, promote_header, read_table_cache, size_export, size_workload,
+    sketch_merge, sketch_quantiles, sketch_samples, stream_chunks, summarize_clusters, sweep_scenarios, time_grid,
+)
+
+def workload(vcpu, ram):
+    return {'tot_vcpu': vcpu, 'tot_ram': ram, 'cur_cores': 0, 'cur_lic_cores': 0}
+
+# --- UTILS ---
+def parse_cell(v):
+    """One cell the slow way: numbers as-is, strings without separators and a unit word."""
+    if v is None or (isinstance(v, float) and np.isnan(v)): return np.nan
+    if isinstance(v, (bool, int, float)): return float(v)
+    m = re.match(NUM_CELL_RE, str(v))
+    return float(m.group(1).replace(',', '')) if m else np.nan
+
+def test_parse_float_matches_cell_by_cell():
+    cells = ["1,024", "512 GB", " 2.5e3 MiB", "12%", "-3", "1,234,567.5", ".5", "abc", "N/A", "1.2.3", "", " ",
+             None, np.nan, True, False, 7, 2.25]
+    got = parse_float(pd.Series(cells, dtype=object))
+    np.testing.assert_array_equal(got.to_numpy(), [parse_cell(v) for v in cells])
+    assert got[:7].tolist() == [1024.0, 512.0, 2500.0, 12.0, -3.0, 1234567.5, 0.5]
+    assert parse_float(pd.Series([True, False])).tolist() == [1.0, 0.0]
+    assert parse_float(pd.Series(["1,024", None], dtype="string")).iloc[0] == 1024.0
+
+# --- COLUMN MATCHING ---
+def scan_col(columns, keywords):
+    """The original double scan: exact (case/space-insensitive) match in keyword order,
+    then the first column containing a keyword, minus the capacity/cluster exclusions."""
+    for kw in keywords:
+        exact = next((c for c in columns if str(c).strip().lower() == kw.lower()), None)
+        if exact: return exact
+    for kw in keywords:
+        for c in columns:
+            cl = str(c).lower()
+            if kw.lower() in cl:
+                if kw.lower() == 'capacity' and 'cluster' in cl: continue
+                if kw.lower() == 'cluster' and any(bad in cl for bad in ['rule', 'capacity', 'free', 'space', 'id']): continue
+                return c
+    return None
+
+def test_match_col_matches_double_scan():
+    rng = np.random.default_rng(16)
+    words = sorted({kw for conf in REQ_MAPS.values() for kw in conf["kws"]})
+    decorations = [lambda w: w, str.upper, str.lower, lambda w: f" {w} ", lambda w: f"{w} MiB", lambda w: f"{w} (KiB)",
+                   lambda w: f"Cluster {w}", lambda w: f"{w} rule", lambda w: f"{w} ID", lambda w: f"Free {w}", lambda w: f"Capacity {w}"]
+    for _ in range(3000):
+        picked = rng.choice(words, int(rng.integers(1, 15)))
+        header = list(dict.fromkeys(decorations[rng.integers(len(decorations))](str(w)) for w in picked))
+        for conf in REQ_MAPS.values():
+            assert match_col(header, conf["kws"]) == scan_col(header, conf["kws"])
+
+# --- STREAMING VM TAB ---
+@pytest.mark.parametrize("chunk_rows", [None, 7, 40])
+def test_stream_chunks_match_promote_header(tmp_path, chunk_rows):
+    vinfo = rvtools_tabs(np.random.default_rng(12))['vInfo'].astype(object)
+    vinfo.loc[3, 'Memory'] = "1,024"  # text cells in a numeric column
+    vinfo.loc[5, 'CPUs'] = "n/a"
+    vinfo.loc[8, 'Host'] = None
+    with pd.ExcelWriter(tmp_path / "rv.xlsx") as w:
+        pd.DataFrame([["Exported by RVTools"]]).to_excel(w, sheet_name='vInfo', index=False, header=False)
+        vinfo.to_excel(w, sheet_name='vInfo', index=False, startrow=2)
+    numeric = ('CPUs', 'Memory', 'Provisioned MiB', 'In Use MiB')
+    keep = lambda header: [(i, c, c in numeric) for i, c in enumerate(header)]
+
+    want = promote_header(pd.read_excel(tmp_path / "rv.xlsx", sheet_name='vInfo', header=None), ['powerstate'])
+    want = want.assign(**{c: parse_float(want[c]) for c in numeric})
+    wb = openpyxl.load_workbook(tmp_path / "rv.xlsx", read_only=True, data_only=True)
+    chunks = list(stream_chunks(wb['vInfo'], ['powerstate'], keep, chunk_rows))
+    wb.close()
+    assert chunk_rows is None or all(len(c) <= chunk_rows for c in chunks)
+    got = pd.concat(chunks, ignore_index=True)
+    blanks_as_none = lambda df: df.astype(object).where(df.notna(), None)  # read_excel infers str columns with NaN blanks
+    pd.testing.assert_frame_equal(blanks_as_none(got), blanks_as_none(want))
+    assert got['Memory'][3] == 1024 and np.isnan(got['CPUs'][5])
+
+# --- LIVE OPTICS PERFORMANCE ---
+def live_optics_workbook(path, perf):
+    """Minimal Live Optics workbook with the given {tab: frame} performance tabs."""
+    with pd.ExcelWriter(path) as w:
+        pd.DataFrame({'VM Name': ["vm0"], 'Cluster': ["c1"]}).to_excel(w, sheet_name='VMs', index=False)
+        pd.DataFrame({'Host Name': ["h0"], 'CPU Cores': [16]}).to_excel(w, sheet_name='ESX Hosts', index=False)
+        pd.DataFrame({'Device Name': ["d0"], 'Capacity': [1]}).to_excel(w, sheet_name='Host Devices', index=False)
+        for tab, df in perf.items():
+            df.to_excel(w, sheet_name=tab, index=False)
+    return path
+
+def perf_samples(rng, n_vm=30, n_t=48):
+    times = pd.date_range("2026-09-01", periods=n_t, freq="5min")
+    return pd.DataFrame({
+        'VM Name': np.repeat([f"vm{i}" for i in range(n_vm)], n_t), 'Timestamp': np.tile(times, n_vm),
+        'CPU (GHz)': rng.random(n_vm * n_t) * 4, 'Memory (GB)': rng.random(n_vm * n_t) * 32,
+    })
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_perf_split_over_tabs_matches_one_tab(tmp_path, streaming):
+    df = perf_samples(np.random.default_rng(21))
+    early = df['Timestamp'] < df['Timestamp'].iloc[24]
+    second = df[~early].assign(**{'VM Name': df.loc[~early, 'VM Name'].str.upper()})  # names match case-insensitively
+    one = live_optics_workbook(tmp_path / "one.xlsx", {'VM Performance': df})
+    split = live_optics_workbook(tmp_path / "split.xlsx", {'VM Performance': df[early], 'VM Performance (2)': second})
+
+    _, a = load_tables(str(one), streaming)
+    _, b = load_tables(str(split), streaming)
+    assert len(b['perf_ent']) == 30
+    pd.testing.assert_frame_equal(a['perf_ent'], b['perf_ent'])
+    if streaming:
+        pd.testing.assert_frame_equal(a['perf_sketch'], b['perf_sketch'])
+    else:
+        order = ['entity', 'time']
+        pd.testing.assert_frame_equal(a['perf'].sort_values(order, ignore_index=True), b['perf'].sort_values(order, ignore_index=True))
+
+# --- QUANTILE SKETCHES ---
+def sketch_inputs(rng, n_ent=20, n=5000):
+    codes = np.sort(rng.integers(0, n_ent, n)).astype('int32')
+    cpu = rng.lognormal(0.0, 1.5, n)
+    cpu[rng.random(n) < 0.05] = 0.0  # idle samples
+    mem = rng.lognormal(2.5, 1.0, n)
+    mem[rng.random(n) < 0.01] = np.nan
+    return codes, cpu, mem
+
+def test_sketch_quantiles_within_alpha():
+    codes, cpu, mem = sketch_inputs(np.random.default_rng(22))
+    sk = sketch_samples(codes, cpu, mem)
+    qs = [0.0, 0.5, 0.9, 0.95, 0.99, 1.0]
+    for metric, vals in zip(PERF_METRICS, (cpu, mem)):
+        got = sketch_quantiles(sk, metric, 20, qs)
+        for e in range(20):
+            v = vals[(codes == e) & ~np.isnan(vals)]
+            want = np.quantile(v, qs, method='lower')
+            want = np.where(want < PERF_SKETCH_MIN, 0.0, want)
+            np.testing.assert_allclose(got[e], want, rtol=PERF_SKETCH_ALPHA * (1 + 1e-9), atol=0, err_msg=f"{metric} entity {e}")
+
+def test_sketch_merge_of_chunks_matches_one_sketch():
+    codes, cpu, mem = sketch_inputs(np.random.default_rng(22))
+    cuts = np.sort(np.random.default_rng(0).integers(0, len(codes), 6))
+    parts = [sketch_samples(c, a, b) for c, a, b in zip(*(np.split(x, cuts) for x in (codes, cpu, mem)))]
+    pd.testing.assert_frame_equal(sketch_merge(parts), sketch_samples(codes, cpu, mem))
+
+# --- RVTOOLS CSV BUNDLES ---
+def rvtools_tabs(rng, n=40):
+    return {
+        'vInfo': pd.DataFrame({
+            'VM': [f"vm{i}" for i in range(n)], 'Powerstate': rng.choice(["poweredOn", "poweredOff"], n),
+            'CPUs': rng.choice([1, 2, 4, 8], n), 'Memory': rng.choice([2048, 4096, 8192], n),
+            'Provisioned MiB': rng.integers(10**4, 10**6, n) + 0.5, 'In Use MiB': rng.integers(10**3, 10**4, n) + 0.25,
+            'Cluster': rng.choice(["c1", "c2"], n), 'Host': rng.choice(["h0", "h1"], n),
+        }),
+        'vHost': pd.DataFrame({'Host': ["h0", "h1"], 'Cluster': ["c1", "c2"], '# CPU': [2, 2], 'Cores per CPU': [16, 24], '# Memory': [524288, 786432]}),
+        'vDatastore': pd.DataFrame({'Name': ["ds0", "ds1"], 'Capacity MiB': [1048576.5, 2097152.5], 'In Use MiB': [524288.5, 1048576.5],
+                                    'Free MiB': [524288.0, 1048576.0], 'Hosts': ["h0", "h1"]}),
+    }
+
+@pytest.mark.parametrize("sep,decimal", [(",", "."), (";", ",")])
+def test_csv_bundle_matches_workbook(tmp_path, sep, decimal):
+    tabs = rvtools_tabs(np.random.default_rng(14))
+    title = pd.DataFrame([["Exported by\nRVTools"]])  # a quoted multi-line cell above the header
+    with pd.ExcelWriter(tmp_path / "rv.xlsx") as w:
+        for tab, df in tabs.items():
+            title.to_excel(w, sheet_name=tab, index=False, header=False)
+            df.to_excel(w, sheet_name=tab, index=False, startrow=1)
+    bundle = tmp_path / "csv"
+    bundle.mkdir()
+    for tab, df in tabs.items():
+        with open(bundle / f"RVTools_tab{tab}.csv", "w", encoding="utf-8", newline="") as f:
+            title.to_csv(f, sep=sep, index=False, header=False)
+            df.to_csv(f, sep=sep, decimal=decimal, index=False)
+
+    want = size_export(str(tmp_path / "rv.xlsx")).report
+    got = size_export(str(bundle)).report
+    for key in ('tot_vms', 'tot_vcpu', 'tot_ram', 'vinfo_prov', 'vinfo_used', 'cur_host_count', 'cur_cores', 'ds_cap', 'ds_free'):
+        assert got[key] == pytest.approx(want[key]), key
+
+# --- TABLE CACHE ---
+def test_table_cache_survives_corrupt_entries(tmp_path):
+    tabs = rvtools_tabs(np.random.default_rng(13))
+    with pd.ExcelWriter(tmp_path / "rv.xlsx") as w:
+        for tab, df in tabs.items():
+            df.to_excel(w, sheet_name=tab, index=False)
+    path, cache = str(tmp_path / "rv.xlsx"), str(tmp_path / "cache")
+    _, fresh = load_tables_cached(path, cache_dir=cache)
+    entry = cache_path(cache, file_digest(path))
+    with open(os.path.join(entry, "vm.arrow"), "r+b") as f:
+        f.truncate(100)
+    assert read_table_cache(entry) is None
+    _, again = load_tables_cached(path, cache_dir=cache)
+    pd.testing.assert_frame_equal(fresh['vm'], again['vm'])
+    assert read_table_cache(entry) is not None  # rewritten
+
+def test_table_cache_falls_back_when_arrow_cannot_write(tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    def refuse(*args, **kwargs):
+        raise pa.ArrowNotImplementedError("unsupported type")
+    monkeypatch.setattr(pd.DataFrame, "to_feather", refuse)
+    path = tmp_path / "rv.xlsx"
+    with pd.ExcelWriter(path) as w:
+        for tab, df in rvtools_tabs(np.random.default_rng(13)).items():
+            df.to_excel(w, sheet_name=tab, index=False)
+    src_type, tables = load_tables_cached(str(path), cache_dir=str(tmp_path / "cache"))
+    assert src_type == "RVTools" and len(tables['vm']) == 40
+
+# --- PROCESSORS ---
+def resolve_by_scan(host_to_cluster, host):
+    """The original lookup: exact name, then short name, then the first host (in table order) with that prefix."""
+    hosts = [(str(h).strip().lower(), c) for h, c in host_to_cluster.items()]
+    h = str(host).strip().lower()
+    for vh, c in hosts:
+        if vh == h: return c, None
+    h_short = h.split('.')[0]
+    for match in (lambda vh: vh.split('.')[0] == h_short, lambda vh: vh.startswith(h_short)):
+        hits = [(vh, c) for vh, c in hosts if match(vh)]
+        if hits: return hits[0][1], (sorted({c for _, c in hits}) if len({c for _, c in hits}) > 1 else None)
+    return None, None
+
+def test_host_cluster_resolver_matches_scan():
+    host_to_cluster = {
+        "esx01.corp.local": "c1", "ESX02.corp.local": "c1", "esx02.lab.local": "c2",  # esx02 names two clusters
+        "esx10.corp.local": "c2", "esx11": "c3", "db-host-a.corp": "c3", "db-host-b.corp": "c1",
+    }
+    res = HostClusterResolver(host_to_cluster)
+    queries = ["esx01.corp.local", "ESX01", "esx02", "esx02.other", "esx1", "esx11.corp.local", "db-host",
+               "db-host-b", "esx0", "nope", " esx10.corp.local ", "esx02.lab.local"]
+    ambiguous = {}
+    for q in queries:
+        want, amb = resolve_by_scan(host_to_cluster, q)
+        assert res.resolve(q) == want, q
+        if amb: ambiguous[q.strip().lower().split('.')[0]] = amb
+    assert res.ambiguous == ambiguous
+    assert res.ambiguous["esx02"] == ["c1", "c2"] and res.resolve("esx02") == "c1"  # first host in table order wins
+    assert res.resolve_list("nope, esx10, esx11") == "c2" and res.resolve_one("nope") == "Unclustered"
+
+# --- CLUSTER SUMMARY ---
+def assert_same_metrics(got, want):
+    assert got.keys() == want.keys()
+    for k, w in want.items():
+        if isinstance(w, (int, float, np.number)) and not isinstance(w, bool):
+            assert got[k] == pytest.approx(w, rel=1e-9, abs=1e-9), k
+        elif isinstance(w, dict) and 'vcpu' in w:  # vm_sizes arrays
+            for c, v in w.items(): np.testing.assert_array_equal(got[k][c], v, err_msg=k)
+        else:
+            assert got[k] == w, k
+
+@pytest.mark.parametrize("include_off", [True, False])
+def test_combine_matches_filter_then_aggregate(tmp_path, include_off):
+    rng = np.random.default_rng(24)
+    tabs = rvtools_tabs(rng, n=200)
+    clusters = [f"c{i}" for i in range(5)]
+    tabs['vInfo']['Cluster'] = rng.choice(clusters, 200)
+    tabs['vInfo']['Host'] = [f"h{clusters.index(c)}" for c in tabs['vInfo']['Cluster']]
+    tabs['vHost'] = pd.DataFrame({'Host': [f"h{i}" for i in range(5)], 'Cluster': clusters, '# CPU': 2,
+                                  'Cores per CPU': rng.choice([16, 24, 32], 5), '# Memory': rng.choice([524288, 786432], 5)})
+    tabs['vDatastore'] = pd.DataFrame({'Name': [f"ds{i}" for i in range(5)], 'Capacity MiB': rng.integers(10**6, 10**7, 5) + 0.5,
+                                       'In Use MiB': rng.integers(10**5, 10**6, 5) + 0.5, 'Free MiB': 10.0**6, 'Hosts': [f"h{i}" for i in range(5)]})
+    with pd.ExcelWriter(tmp_path / "rv.xlsx") as w:
+        for tab, df in tabs.items():
+            df.to_excel(w, sheet_name=tab, index=False)
+    src_type, df_map = load_tables(str(tmp_path / "rv.xlsx"))
+    tables = normalize_tables(df_map, auto_map(df_map))
+    summary = summarize_clusters(tables, src_type)
+
+    for _ in range(12):
+        subset = list(rng.choice(clusters, rng.integers(1, 5), replace=False))
+        assert_same_metrics(summary.combine(subset, include_off), aggregate_workload(filter_tables(tables, subset, include_off), src_type))
+    assert_same_metrics(summary.combine(None, include_off), aggregate_workload(filter_tables(tables, ["All Clusters"], include_off), src_type))
+
+# --- MULTI-FILE CONSOLIDATION ---
+def test_merge_perf_raw_and_sketch_agree(tmp_path):
+    rng = np.random.default_rng(11)
+    day1 = perf_samples(rng)
+    day2 = perf_samples(rng, n_vm=40).assign(Timestamp=lambda d: d['Timestamp'] + pd.Timedelta(days=1))
+    paths = [live_optics_workbook(tmp_path / f"{i}.xlsx", {'VM Performance': df}) for i, df in enumerate((day1, day1, day2))]
+
+    raw = merge_perf([load_tables(str(p))[1] for p in paths], ["vc"] * 3)
+    sk = merge_perf([load_tables(str(p), streaming=True)[1] for p in paths], ["vc"] * 3)
+    assert len(raw[0]) == len(sk[0]) == 40
+    assert len(raw[1]) == len(day1) + len(day2)  # the repeated export counts once, the second window is kept
+    pd.testing.assert_frame_equal(raw[0], sk[0][raw[0].columns])
+    codes = raw[1]['entity'].to_numpy()
+    resketched = sketch_samples(codes, raw[1]['cpu_ghz'].to_numpy(dtype='float64'), raw[1]['mem_gb'].to_numpy(dtype='float64'))
+    pd.testing.assert_frame_equal(resketched, sk[2])
+
+# --- SCENARIO SWEEP ---
+def test_sweep_scenarios_matches_size_workload():
+    rng = np.random.default_rng(17)
+    grids = dict(sockets=[1, 2], cores=[16, 24, 32], ram_gb=[512, 1024], vcpu_ratio=[3.0, 4.5],
+                 cpu_buffer=[0, 15], ram_buffer=[10], min_hosts=[2, 4], ha_nodes=[0, 1, 2], growth=[0.0, 0.1], years=[1, 3])
+    for _ in range(10):
+        db = workload(float(rng.integers(10, 20000)), float(rng.integers(10, 100000)))
+        sweep = sweep_scenarios(db, **grids)
+        assert len(sweep) == np.prod([len(v) for v in grids.values()])
+        for row in sweep.itertuples():
+            params = SizingParams(sockets=row.sockets, cores=row.cores, ram_gb=row.ram_gb, vcpu_ratio=row.vcpu_ratio,
+                                  cpu_buffer=row.cpu_buffer, ram_buffer=row.ram_buffer, min_hosts=row.min_hosts,
+                                  ha_nodes=row.ha_nodes, growth=row.growth, years=row.years)
+            sz = size_workload(db, params)
+            assert (row.hosts_now, row.hosts_fut, row.constraint, row.now_lic_cores, row.fut_lic_cores) == \
+                   (sz['hosts_now'], sz['hosts_fut'], sz['constraint'], sz['now_lic_cores'], sz['fut_lic_cores'])
+            assert row.ratio_now == pytest.approx(sz['ratio_now'])
+
+# --- NUMA FIT ---
+def test_numa_report_buckets_cpu_and_ram(tmp_path):
+    tabs = rvtools_tabs(np.random.default_rng(20))
+    tabs['vInfo'].loc[0, 'CPUs'] = 0  # e.g. a template with no vCPU count
+    with pd.ExcelWriter(tmp_path / "rv.xlsx") as w:
+        for tab, df in tabs.items():
+            df.to_excel(w, sheet_name=tab, index=False)
+    report = size_export(str(tmp_path / "rv.xlsx")).report
+    cpu, ram = report['numa_fit']['cpu_hist'], report['numa_fit']['ram_hist']
+    assert cpu['bins'][:3] == ["0", "1", "2-3"] and cpu['fits'][:2] == [1, (tabs['vInfo']['CPUs'] == 1).sum()]
+    assert sum(ram['fits']) + sum(ram['spans']) + sum(ram['exceeds']) == 40
+    html = generate_html_report(report, "All Clusters", "rv.xlsx", "Acme", "")
+    assert "RAM Distribution" in html and all(f"<td>{b}</td>" in html for b, n in zip(ram['bins'], ram['fits']) if n)
+
+# --- CATALOG OPTIMIZER ---
+@pytest.mark.parametrize("objective", ["cost", "license"])
+@pytest.mark.parametrize("horizon", ["now", "future"])
+def test_optimize_catalog_matches_brute_force(objective, horizon):
+    rng = np.random.default_rng(18)
+    for _ in range(50):
+        db = workload(float(rng.integers(10, 20000)), float(rng.integers(10, 100000)))
+        params = SizingParams(vcpu_ratio=float(rng.choice([2, 4, 6])), cpu_buffer=float(rng.integers(0, 30)),
+                              ram_buffer=float(rng.integers(0, 30)), ha_nodes=int(rng.integers(0, 3)), min_hosts=int(rng.integers(1, 5)))
+        core_price = float(rng.choice([0.0, 0.05]))
+        scored = []
+        for row in expand_catalog(EXAMPLE_CATALOG).itertuples():
+            sz = size_workload(db, dataclasses.replace(params, sockets=int(row.sockets), cores=int(row.cores), ram_gb=row.ram_gb))
+            hosts, lic = (sz['hosts_now'], sz['now_lic_cores']) if horizon == 'now' else (sz['hosts_fut'], sz['fut_lic_cores'])
+            cost = hosts * row.cost + lic * core_price
+            scored.append(((lic, cost) if objective == 'license' else (cost, hosts), hosts, lic))
+        best = min(scored, key=lambda s: s[0])
+
+        top = optimize_catalog(db, EXAMPLE_CATALOG, params, objective, core_price, horizon, top=3).iloc[0]
+        got = (top['lic_cores'], top['total_cost']) if objective == 'license' else (top['total_cost'], top['hosts'])
+        assert got == pytest.approx(best[0])
+
+def test_optimize_catalog_empty():
+    assert optimize_catalog(workload(100, 100), []).empty
+    assert optimize_catalog(workload(100, 100), pd.DataFrame()).empty
+
+def test_optimize_catalog_rejects_non_positive_hardware():
+    bad = [{'sku': "zero", 'sockets': 2, 'cores': 0, 'ram_gb': [512]}]
+    with pytest.raises(ValueError, match="zero"):
+        optimize_catalog(workload(100, 100), EXAMPLE_CATALOG + bad)
+
+# --- PLACEMENT SIMULATION ---
+def place_one_by_one(cpu, ram, params, numa, strategy):
+    """Reference packing: VMs one at a time, in place_vms' order (largest share first,
+    then by shape), onto the first (ffd) or fullest (bfd) host that fits, opening a new
+    host when none does."""
+    nodes = params.sockets if numa else 1
+    node_cpu = params.sockets * params.cores * (1 - params.cpu_buffer/100) * params.vcpu_ratio / nodes
+    node_ram = params.ram_gb * (1 - params.ram_buffer/100) / nodes
+    cpu, ram = np.nan_to_num(cpu), np.nan_to_num(ram)
+    q_cpu, q_ram = np.ceil(cpu), np.ceil(ram)
+    too_big = (q_cpu > node_cpu * nodes) | (q_ram > node_ram * nodes) | (cpu > params.sockets * params.cores)
+    wide = ((q_cpu > min(params.cores, node_cpu)) | (q_ram > node_ram)) if numa else np.zeros(len(cpu), bool)
+    share = np.maximum(q_cpu / (node_cpu * nodes), q_ram / (node_ram * nodes))
+    order = sorted((i for i in range(len(cpu)) if not too_big[i] and (q_cpu[i] > 0 or q_ram[i] > 0)),
+                   key=lambda i: (-share[i], q_cpu[i], q_ram[i], wide[i], i))
+
+    free = []  # per host: list of [cpu, ram] per node
+    assignment = np.full(len(cpu), -1)
+    for i in order:
+        span = nodes if wide[i] else 1
+        c, r = q_cpu[i] / span, q_ram[i] / span
+        fits = lambda n: n[0] >= c * (1 - 1e-9) and n[1] >= r * (1 - 1e-9)
+        bins = [(h, [k]) for h in range(len(free)) for k in range(nodes)] if span == 1 else [(h, list(range(nodes))) for h in range(len(free))]
+        bins = [(h, ks) for h, ks in bins if all(fits(free[h][k]) for k in ks)]
+        if strategy == "bfd":
+            bins.sort(key=lambda b: sum(free[b[0]][k][0] / node_cpu + free[b[0]][k][1] / node_ram for k in b[1]))
+        if not bins:
+            free.append([[node_cpu, node_ram] for _ in range(nodes)])
+            bins = [(len(free) - 1, [0] if span == 1 else list(range(nodes)))]
+        h, ks = bins[0]
+        for k in ks:
+            free[h][k][0] -= c
+            free[h][k][1] -= r
+        assignment[i] = h
+    return assignment, len(free)
+
+@pytest.mark.parametrize("numa", [False, True])
+@pytest.mark.parametrize("strategy", ["ffd", "bfd"])
+def test_place_vms_matches_per_vm_loop(numa, strategy):
+    rng = np.random.default_rng(19)
+    for _ in range(20):
+        n = int(rng.integers(1, 300))
+        cpu = rng.choice([0, 1, 2, 4, 8, 16, 32, 64], n).astype(float)
+        ram = rng.choice([0, 2, 4, 8, 16, 64, 256, 768, 2048], n).astype(float)
+        cpu[rng.random(n) < 0.05] = np.nan
+        params = SizingParams(sockets=int(rng.choice([1, 2, 4])), cores=int(rng.choice([8, 16, 24])), ram_gb=int(rng.choice([256, 512, 1024])),
+                              vcpu_ratio=float(rng.choice([1, 3, 5])))
+        res = place_vms(cpu, ram, params, numa, strategy)
+        assignment, n_hosts = place_one_by_one(cpu, ram, params, numa, strategy)
+        assert res['hosts_packed'] == n_hosts
+        np.testing.assert_array_equal(res['assignment'], assignment)
+
+def test_place_vms_skips_zero_size_vms():
+    res = place_vms(np.array([4., 0., 2.]), np.array([8., 0., np.nan]), SizingParams())
+    assert res['assignment'].tolist() == [0, -1, 0]
+    assert res['zero_size'].tolist() == [1]
+    assert res['hosts_packed'] == 1
+
+    res = place_vms(np.zeros(3), np.full(3, np.nan), SizingParams())
+    assert res['hosts_packed'] == 0 and res['zero_size'].tolist() == [0, 1, 2]
+
+# --- COINCIDENT DEMAND ---
+def offset_samples(rng, n_vm, n_t, step_s=300, drop=0.1):
+    """n_vm VMs sampled every step_s seconds, each with its own offset under a minute,
+    with a share of samples missing."""
+    offsets = rng.integers(0, 60, n_vm) * 10**9
+    times = (np.arange(n_t)[None, :] * step_s * 10**9 + offsets[:, None]).ravel().astype('int64')
+    codes = np.repeat(np.arange(n_vm), n_t).astype('int32')
+    keep = rng.random(len(codes)) >= drop
+    return codes[keep], times[keep], rng.random(keep.sum()) * 10
+
+def test_time_grid_ignores_per_vm_offsets():
+    codes, times, _ = offset_samples(np.random.default_rng(23), 200, 2016)
+    start, step = time_grid(codes, times)
+    assert step == 300 * 10**9
+    assert np.rint((times - start) / step).max() + 1 == 2016
+
+def test_time_grid_caps_slots():
+    times = np.arange(0, 30 * 86400, 20).astype('int64') * 10**9  # a month at 20 s
+    start, step = time_grid(np.zeros(len(times), dtype='int32'), times)
+    assert np.rint((times - start) / step).max() + 1 <= PERF_MAX_SLOTS
+
+def test_coincident_series_matches_pivot():
+    rng = np.random.default_rng(23)
+    codes, times, values = offset_samples(rng, 60, 300)
+    # a third of the VMs exist for only part of the collection
+    born, gone = rng.integers(0, 150, 60), rng.integers(150, 300, 60)
+    alive = (rng.random(60) < 0.66)[codes] | ((times >= born[codes] * 300 * 10**9) & (times < gone[codes] * 300 * 10**9))
+    codes, times, values = codes[alive], times[alive], values[alive]
+    groups = rng.integers(0, 7, 60)
+    start, step = time_grid(codes, times)
+    slots = np.rint((times - start) / step).astype('int64')
+    got = coincident_series(codes, slots, values, groups, 7, int(slots.max()) + 1)
+
+    per_vm = pd.DataFrame({'vm': codes, 'slot': slots, 'v': values}).pivot_table(index='slot', columns='vm', values='v', aggfunc='mean')
+    per_vm = per_vm.reindex(range(int(slots.max()) + 1)).ffill(limit_area='inside').fillna(0.0)
+    want = per_vm.T.groupby(groups[per_vm.columns]).sum().reindex(range(7), fill_value=0.0)
+    np.testing.assert_allclose(got, want.to_numpy())
+
+def test_coincident_series_counts_entities_only_while_sampled():
+    codes = np.array([0, 0, 0, 1, 1], dtype='int32')
+    slots = np.array([0, 1, 3, 2, 3])
+    values = np.array([1.0, 2.0, 4.0, 10.0, 20.0])
+    got = coincident_series(codes, slots, values, np.array([0, 0]), 1, 5)
+    assert got.tolist() == [[1.0, 2.0, 12.0, 24.0, 0.0]]